@@ -1,36 +1,15 @@
-file = open("Detail.csv", "r")
+from users import UserStore, SessionCache
 
-lines = file.readlines()
-file.close()
+store = UserStore()
+sessions = SessionCache()
 
-lines = [line.strip() for line in lines]
-
-header = lines[0].split(",")
-
-data = {}
-for h in header:
-    data[h] = []
-
-for line in lines[1:]:
-    values = line.split(",")
-    for i in range(len(header)):
-        value = values[i]
-        try:
-            if "." in value:
-                data[header[i]].append(float(value))
-            else:
-                data[header[i]].append(int(value))
-        except:
-            data[header[i]].append(value)
-
-print(data)
-
-print(data["user_name"])
+print(f"Loaded {len(store)} users")
 
 while True:
     print("1.Register")
     print("2.Login")
     print("3.Exit")
+    print("4.Import Users")
     
     try:
         choice = int(input("Enter the Choice : "))
@@ -41,13 +20,12 @@ while True:
     if choice == 1:
         new_user = input("Enter new username : ")
 
-        if new_user in data['user_name']:
+        if new_user in store:
             print("User already exists")
             continue
 
-        try:
-            new_pass = int(input("Enter new passcode : "))
-        except ValueError:
+        new_pass = input("Enter new passcode : ").strip()
+        if not new_pass.isdigit():
             print("Passcode must be numbers only")
             continue
 
@@ -57,43 +35,56 @@ while True:
             print("Status must be 0 or 1")
             continue
 
-        data['user_name'].append(new_user)
-        data['passcode'].append(new_pass)
-        data['status'].append(new_status)
-
-        file = open("Detail.csv", "a")
-        file.write(f"\n{new_user},{new_pass},{new_status}")
-        file.close()
+        store.register(new_user, new_pass, new_status)
 
         print("Registration Successful")
 
     if choice == 2:
         n = input("Enter the Account name : ")
 
-        if n not in data['user_name']:
+        if n not in store:
             print("User Not Found")
             continue
 
         print("User Found")
 
-        index = data['user_name'].index(n)
+        if sessions.valid(n):
+            print("Login Successful (session)")
+            print("Account is Active ")
+            continue
 
-        try:
-            p = int(input("Enter the Passcod : "))
-        except ValueError:
+        p = input("Enter the Passcod : ").strip()
+        if not p.isdigit():
             print("Passcode must be numbers only")
             continue
 
-        if p != data['passcode'][index]:
+        result = store.check(n, p)
+
+        if result == "wrong_passcode":
             print("Wrong Passcode")
             continue
 
-        if data['status'][index] == 1:
+        if result == "active":
+            sessions.add(n)
             print("Login Successful")
             print("Account is Active ")
         else:
             print("Account is Inactive")
     
     if choice==3:
+        store.flush()
         print("Exiting......")
         break
+
+    if choice == 4:
+        path = input("Enter the CSV file to import : ")
+
+        try:
+            added, rejects = store.bulk_import(path)
+        except OSError as e:
+            print("Cannot read file :", e)
+            continue
+
+        for line_no, name, reason in rejects:
+            print(f"Line {line_no} ({name}) : {reason}")
+        print(f"Imported {added} users, rejected {len(rejects)}")
@@ -36,33 +36,10 @@ if pin==pincode:
 else:
   print("Inavlaid PIN")
 
-f=open("/content/Demo.csv")
+from csvload import load_columns, iter_chunks
 
-fn=f.readlines()
-print(fn)
-
-fs=[fn.strip() for fn in fn]
-print(fs)
-
-h1=fs[0]
-print(h1)
-
-dic={}
-
-dic[h1]=0
+dic = load_columns("Demo.csv")
 print(dic)
 
-headers = fs[0].split(',')
-
-dic = {h: [] for h in headers}
-
-
-for row in fs[1:]:
-    values = row.split(',')
-    for h, v in zip(headers, values):
-        if v.isdigit():
-            dic[h].append(int(v))
-        else:
-            dic[h].append(v)
-
-print(dic)
+for chunk in iter_chunks("Demo.csv", chunk_rows=2):
+  print(chunk)
@@ -1,15 +1,27 @@
-import csv
-import os
+import threading
 from datetime import datetime
 from enum import Enum
+from itertools import islice
+from functools import partial
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Optional
+from engine import engine
+from idgen import new_id
+from ledger import PROJECT_TYPES, PROJECT_STATUSES
+from sharding import ShardedBalance, SHARD_COUNT
+from window import TransactionWindow, SEP
+from ranking import Rankings
+from search import NameIndex, PAGE_SIZE
+from idempotency import idempotency
+from money import to_cents, format_cents
 
 # Enum for transaction types
 class TransactionType(Enum):
     DEPOSIT = "Deposit"
     WITHDRAWAL = "Withdrawal"
     TRANSFER = "Transfer"
+    TRANSFER_OUT = "Transfer Out"
+    FEE = "Fee"
 
 # Enum for account types
 class AccountType(Enum):
@@ -17,17 +29,38 @@ class AccountType(Enum):
     CHECKING = "Checking"
     BUSINESS = "Business"
 
-# Transaction class - represents a single transaction
+# Ledger types and statuses as this front end names them
+TRANSACTION_TYPES = {
+    "DEPOSIT": TransactionType.DEPOSIT,
+    "WITHDRAW": TransactionType.WITHDRAWAL,
+    "TRANSFER_DEBIT": TransactionType.TRANSFER_OUT,
+    "TRANSFER_CREDIT": TransactionType.TRANSFER,
+    "FEE": TransactionType.FEE
+}
+TRANSACTION_STATUSES = {ledger: status for status, ledger in PROJECT_STATUSES.items()}
+
+# Transaction class - represents a single transaction; amounts are in cents
 class Transaction:
-    def __init__(self, transaction_id: int, amount: float, transaction_type: TransactionType, timestamp: str = None):
+    def __init__(self, transaction_id: int, amount: int, transaction_type: TransactionType, timestamp: str = None):
         self.transaction_id = transaction_id
         self.amount = amount
         self.transaction_type = transaction_type
         self.timestamp = timestamp if timestamp else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.status = "Completed"
     
+    def encode(self) -> str:
+        return SEP.join([str(self.transaction_id), str(self.amount), self.transaction_type.value,
+                         self.timestamp, self.status])
+    
+    @staticmethod
+    def decode(data: str) -> 'Transaction':
+        transaction_id, amount, transaction_type, timestamp, status = data.split(SEP)
+        transaction = Transaction(int(transaction_id), int(amount), TransactionType(transaction_type), timestamp)
+        transaction.status = status
+        return transaction
+    
     def __str__(self):
-        return f"ID: {self.transaction_id}, Type: {self.transaction_type.value}, Amount: ${self.amount:.2f}, Time: {self.timestamp}"
+        return f"ID: {self.transaction_id}, Type: {self.transaction_type.value}, Amount: ${format_cents(self.amount)}, Time: {self.timestamp}"
     
     def __repr__(self):
         return self.__str__()
@@ -36,7 +69,7 @@ class Transaction:
 class BankAccount(ABC):
     _account_counter = 1000
     
-    def __init__(self, account_holder: str, account_type: AccountType, initial_balance: float = 0, account_number: int = None):
+    def __init__(self, account_holder: str, account_type: AccountType, initial_balance: int = 0, account_number: int = None):
         if account_number is None:
             self.account_number = BankAccount._account_counter
             BankAccount._account_counter += 1
@@ -49,53 +82,152 @@ class BankAccount(ABC):
         self.account_holder = account_holder
         self.account_type = account_type
         self.balance = initial_balance
-        self.transactions: List[Transaction] = []
+        # Newest transactions in memory, older ones spilled to disk
+        self.transactions = TransactionWindow(Transaction.encode, Transaction.decode)
+        self.saved_transactions = 0  # leading transactions already in the ledger
+        self.interest_month = ""  # last month-end interest posting, YYYY-MM
         self.is_active = True
+        self.on_change = None  # called with (number, balance, count, version) after each change
+        self.version = 0  # orders the changes reported to on_change
+        self.lock = threading.Lock()
+        self.store = None  # set by Bank: applies [(account_number, delta, floor)] to storage
     
     @abstractmethod
-    def calculate_interest(self):
-        """Calculate interest based on account type"""
+    def calculate_interest(self) -> int:
+        """One month's interest on the current balance, by account type"""
         pass
     
-    def deposit(self, amount: float) -> bool:
+    def deposit(self, amount: int) -> bool:
         """Deposit money into account"""
         if amount <= 0:
             print("Invalid deposit amount!")
             return False
         
-        self.balance += amount
-        transaction = Transaction(len(self.transactions) + 1, amount, TransactionType.DEPOSIT)
-        self.transactions.append(transaction)
-        print(f"Deposit of ${amount:.2f} successful!")
+        ok, result = self._move(amount)
+        if not ok:
+            print(f"Deposit failed: {result}")
+            return False
+        self._record(amount, TransactionType.DEPOSIT, result)
+        print(f"Deposit of ${format_cents(amount)} successful!")
         return True
     
-    def withdraw(self, amount: float) -> bool:
+    def withdraw(self, amount: int) -> bool:
         """Withdraw money from account"""
         if amount <= 0:
             print("Invalid withdrawal amount!")
             return False
         
-        if amount > self.balance:
-            print(f"Insufficient balance! Available: ${self.balance:.2f}")
+        debit, floor = self.debit_terms(amount)
+        ok, result = self._move(-debit, floor)
+        if not ok:
+            if result == "INSUFFICIENT":
+                print(f"Insufficient balance! Available: ${format_cents(self.balance)}")
+            else:
+                print(f"Withdrawal failed: {result}")
             return False
-        
-        self.balance -= amount
-        transaction = Transaction(len(self.transactions) + 1, amount, TransactionType.WITHDRAWAL)
-        self.transactions.append(transaction)
-        print(f"Withdrawal of ${amount:.2f} successful!")
+        self._record(amount, TransactionType.WITHDRAWAL, result)
+        self._record_fee(debit - amount, result)
+        print(f"Withdrawal of ${format_cents(amount)} successful!")
         return True
     
-    def get_balance(self) -> float:
+    def debit_terms(self, amount: int) -> tuple:
+        """(total taken from the balance, lowest balance allowed) to withdraw amount"""
+        return amount, 0
+    
+    def _move(self, delta: int, floor: Optional[int] = None) -> tuple:
+        """Move the balance by delta unless it would end below floor
+
+        Returns (True, new balance) or (False, reason), as engine.adjust does.
+        """
+        if self.store is None:
+            return self._move_local(delta, floor)
+        ok, result = self.store([(self.account_number, delta, floor)])
+        if not ok:
+            return ok, result
+        balance = result[self.account_number]
+        self._settle(balance)
+        return True, balance
+    
+    def _move_local(self, delta: int, floor: Optional[int]) -> tuple:
+        # Outside a Bank there is no store: the balance is only in memory.
+        balance = self.balance + delta
+        if floor is not None and balance < floor:
+            return False, "INSUFFICIENT"
+        self.balance = balance
+        return True, balance
+    
+    def _settle(self, balance: int):
+        """Take the balance the store returned, moves by other processes included"""
+        self.balance = balance
+    
+    def _record(self, amount: int, transaction_type: TransactionType, balance: int,
+                timestamp: str = None) -> Transaction:
+        """Append a transaction and report balance, the balance it left"""
+        with self.lock:
+            transaction = Transaction(len(self.transactions) + 1, amount, transaction_type, timestamp)
+            self.transactions.append(transaction)
+        self.notify_change(balance)
+        return transaction
+    
+    def _record_fee(self, fee: int, balance: int):
+        # Fees taken with a debit get their own ledger row.
+        if fee:
+            self._record(fee, TransactionType.FEE, balance)
+    
+    def notify_change(self, balance: int = None):
+        """Report balance (the current one if None) and the transaction count"""
+        with self.lock:
+            if balance is None:
+                balance = self.balance
+            self.version += 1
+            change = (self.account_number, balance, len(self.transactions), self.version)
+        if self.on_change:
+            self.on_change(*change)
+    
+    def set_window(self, max_items: int = None, max_days: int = None):
+        """Limit how many transactions, or how many days of them, stay in memory"""
+        self.transactions.resize(max_items, max_days)
+    
+    def post_interest(self, amount: int, balance: int, timestamp: str = None) -> Transaction:
+        """Record interest the storage engine has credited; balance is the new balance"""
+        self._settle(balance)
+        return self._record(amount, TransactionType.DEPOSIT, balance, timestamp)
+    
+    def get_balance(self) -> int:
         """Get current balance"""
         return self.balance
     
+    def snapshot(self) -> 'AccountSnapshot':
+        """Read-only view of the account as it is now"""
+        return AccountSnapshot(self)
+    
+    def print_statement(self):
+        """Print account statement"""
+        self.snapshot().print_statement()
+
+# Read-only view of an account at one point in time
+class AccountSnapshot:
+    def __init__(self, account: BankAccount):
+        self.account_number = account.account_number
+        self.account_holder = account.account_holder
+        self.account_type = account.account_type
+        self.balance = account.balance
+        # Transactions are only ever appended, so the list and its current
+        # length pin the history without copying it.
+        self._transactions = account.transactions
+        self._count = len(account.transactions)
+    
+    @property
+    def transactions(self):
+        return islice(self._transactions, self._count)
+    
     def print_statement(self):
         """Print account statement"""
         print(f"\n{'='*60}")
         print(f"Account Statement - {self.account_holder}")
         print(f"Account Number: {self.account_number}")
         print(f"Account Type: {self.account_type.value}")
-        print(f"Current Balance: ${self.balance:.2f}")
+        print(f"Current Balance: ${format_cents(self.balance)}")
         print(f"{'='*60}")
         print("Transaction History:")
         for transaction in self.transactions:
@@ -104,78 +236,112 @@ class BankAccount(ABC):
 
 # Savings Account - inherits from BankAccount
 class SavingsAccount(BankAccount):
-    def __init__(self, account_holder: str, initial_balance: float = 0, account_number: int = None):
+    def __init__(self, account_holder: str, initial_balance: int = 0, account_number: int = None):
         super().__init__(account_holder, AccountType.SAVINGS, initial_balance, account_number)
         self.interest_rate = 0.04  # 4% annual interest
     
-    def calculate_interest(self):
+    def calculate_interest(self) -> int:
         """Calculate monthly interest"""
-        monthly_interest = self.balance * (self.interest_rate / 12)
-        self.balance += monthly_interest
-        transaction = Transaction(len(self.transactions) + 1, monthly_interest, TransactionType.DEPOSIT)
-        self.transactions.append(transaction)
-        print(f"Interest added: ${monthly_interest:.2f}")
-        return monthly_interest
+        return round(self.balance * (self.interest_rate / 12))
 
 # Checking Account - inherits from BankAccount
 class CheckingAccount(BankAccount):
-    def __init__(self, account_holder: str, initial_balance: float = 0, account_number: int = None):
+    def __init__(self, account_holder: str, initial_balance: int = 0, account_number: int = None):
         super().__init__(account_holder, AccountType.CHECKING, initial_balance, account_number)
-        self.overdraft_limit = 500  # $500 overdraft protection
+        self.overdraft_limit = 50000  # $500 overdraft protection, in cents
     
-    def calculate_interest(self):
+    def calculate_interest(self) -> int:
         """No interest for checking accounts"""
         return 0
     
-    def withdraw(self, amount: float) -> bool:
+    def withdraw(self, amount: int) -> bool:
         """Withdraw with overdraft protection"""
         if amount <= 0:
             print("Invalid withdrawal amount!")
             return False
         
-        if amount > (self.balance + self.overdraft_limit):
-            print(f"Withdrawal exceeds limit! Available with overdraft: ${self.balance + self.overdraft_limit:.2f}")
+        debit, floor = self.debit_terms(amount)
+        ok, result = self._move(-debit, floor)
+        if not ok:
+            if result == "INSUFFICIENT":
+                print(f"Withdrawal exceeds limit! Available with overdraft: ${format_cents(self.balance + self.overdraft_limit)}")
+            else:
+                print(f"Withdrawal failed: {result}")
             return False
-        
-        self.balance -= amount
-        transaction = Transaction(len(self.transactions) + 1, amount, TransactionType.WITHDRAWAL)
-        self.transactions.append(transaction)
-        print(f"Withdrawal of ${amount:.2f} successful!")
+        self._record(amount, TransactionType.WITHDRAWAL, result)
+        self._record_fee(debit - amount, result)
+        print(f"Withdrawal of ${format_cents(amount)} successful!")
         return True
+    
+    def debit_terms(self, amount: int) -> tuple:
+        return amount, -self.overdraft_limit
 
 # Business Account - inherits from BankAccount
 class BusinessAccount(BankAccount):
-    def __init__(self, account_holder: str, initial_balance: float = 0, account_number: int = None):
+    def __init__(self, account_holder: str, initial_balance: int = 0, account_number: int = None):
+        self.shards: Optional[ShardedBalance] = None  # set for hot accounts
         super().__init__(account_holder, AccountType.BUSINESS, initial_balance, account_number)
         self.interest_rate = 0.02  # 2% annual interest
-        self.transaction_fee = 0.50  # $0.50 per transaction
+        self.transaction_fee = 50  # $0.50 per transaction, in cents
     
-    def calculate_interest(self):
+    @property
+    def balance(self) -> int:
+        return self.shards.total() if self.shards else self._balance
+    
+    @balance.setter
+    def balance(self, value: int):
+        if self.shards:
+            self.shards.reset(value)
+        else:
+            self._balance = value
+    
+    def enable_sharding(self, shards: int = SHARD_COUNT):
+        """Split the in-memory balance so concurrent operations do not contend on it
+
+        Only moves kept in memory (an account outside a Bank) run on the
+        shards. In a Bank every move commits through the store, which
+        serializes them and checks the floor, and the shards are reset to
+        the balance it returns.
+        """
+        self.shards = ShardedBalance(self._balance, shards) if shards > 1 else None
+    
+    def calculate_interest(self) -> int:
         """Calculate monthly interest"""
-        monthly_interest = self.balance * (self.interest_rate / 12)
-        self.balance += monthly_interest
-        transaction = Transaction(len(self.transactions) + 1, monthly_interest, TransactionType.DEPOSIT)
-        self.transactions.append(transaction)
-        print(f"Interest added: ${monthly_interest:.2f}")
-        return monthly_interest
-    
-    def withdraw(self, amount: float) -> bool:
+        return round(self.balance * (self.interest_rate / 12))
+    
+    def withdraw(self, amount: int) -> bool:
         """Withdraw with transaction fee"""
         if super().withdraw(amount):
-            self.balance -= self.transaction_fee
-            print(f"Transaction fee: ${self.transaction_fee:.2f}")
+            print(f"Transaction fee: ${format_cents(self.transaction_fee)}")
             return True
         return False
+    
+    def debit_terms(self, amount: int) -> tuple:
+        # Amount and fee leave in one debit, so the fee cannot overdraw the account.
+        return amount + self.transaction_fee, 0
+    
+    def _move_local(self, delta: int, floor: Optional[int]) -> tuple:
+        if not self.shards:
+            return super()._move_local(delta, floor)
+        if delta < 0 and not self.shards.debit(-delta):
+            return False, "INSUFFICIENT"
+        if delta > 0:
+            self.shards.credit(delta)
+        return True, self.shards.total()
 
 # Bank class - manages all accounts
 class Bank:
     def __init__(self, bank_name: str):
         self.bank_name = bank_name
         self.accounts: dict = {}
-        self.accounts_file = "accounts.csv"
-        self.transactions_file = "transactions.csv"
+        self.rankings = Rankings()
+        self.names = NameIndex()
+        self.saved_details = {}  # account number -> details as last saved
+        self.engine = engine
+        self.accounts_file = engine.path
+        self.transactions_file = engine.ledger.directory
     
-    def create_account(self, account_holder: str, account_type: AccountType, initial_balance: float = 0, account_number: int = None) -> BankAccount:
+    def create_account(self, account_holder: str, account_type: AccountType, initial_balance: int = 0, account_number: int = None) -> BankAccount:
         """Create a new account"""
         # Check if account number already exists
         if account_number and account_number in self.accounts:
@@ -189,13 +355,22 @@ class Bank:
         else:
             account = BusinessAccount(account_holder, initial_balance, account_number)
         
-        self.accounts[account.account_number] = account
+        self._add(account)
+        if initial_balance:
+            # The opening balance goes to the ledger as a deposit, flushed with the account row.
+            account._record(initial_balance, TransactionType.DEPOSIT, initial_balance)
+            self.engine.log(self.transaction_rows([account]))
         print(f"Account created successfully! Account Number: {account.account_number}")
-        self.save_accounts()
+        self.save_accounts([account])
         return account
     
-    def transfer(self, from_account: int, to_account: int, amount: float) -> bool:
-        """Transfer money between accounts"""
+    def transfer(self, from_account: int, to_account: int, amount: int,
+                 idempotency_key: Optional[str] = None) -> bool:
+        """Transfer money between accounts; a repeated idempotency_key is not applied again"""
+        return idempotency.run(idempotency_key, ["bank_transfer", from_account, to_account, amount],
+                               lambda: self._transfer(from_account, to_account, amount))
+    
+    def _transfer(self, from_account: int, to_account: int, amount: int) -> bool:
         if from_account not in self.accounts or to_account not in self.accounts:
             print("Invalid account number!")
             return False
@@ -203,125 +378,251 @@ class Bank:
         source = self.accounts[from_account]
         destination = self.accounts[to_account]
         
-        if source.withdraw(amount):
-            destination.balance += amount
-            transaction = Transaction(len(destination.transactions) + 1, amount, TransactionType.TRANSFER)
-            destination.transactions.append(transaction)
-            print(f"Transfer of ${amount:.2f} from {source.account_holder} to {destination.account_holder} successful!")
-            self.save_accounts()
-            self.save_all_transactions()
-            return True
-        return False
+        if amount <= 0:
+            print("Invalid transfer amount!")
+            return False
+        
+        # Both balances move in one group, or neither does
+        debit, floor = source.debit_terms(amount)
+        ok, result = self._adjust([(from_account, -debit, floor), (to_account, amount, None)])
+        if not ok:
+            if result == "INSUFFICIENT":
+                print(f"Insufficient balance! Available: ${format_cents(source.balance)}")
+            else:
+                print(f"Transfer failed: {result}")
+            return False
+        source._settle(result[from_account])
+        destination._settle(result[to_account])
+        
+        source._record(amount, TransactionType.TRANSFER_OUT, result[from_account])
+        source._record_fee(debit - amount, result[from_account])
+        destination._record(amount, TransactionType.TRANSFER, result[to_account])
+        print(f"Transfer of ${format_cents(amount)} from {source.account_holder} to {destination.account_holder} successful!")
+        self.save_all_transactions()
+        return True
+    
+    def _adjust(self, mutations) -> tuple:
+        """engine.adjust for [(account number, delta, floor)] with int account numbers"""
+        ok, result = self.engine.adjust([(str(number), delta, floor)
+                                         for number, delta, floor in mutations])
+        if ok:
+            result = {int(number): balance for number, balance in result.items()}
+        return ok, result
+    
+    def post_interest(self, account: BankAccount, amount: int, month: str) -> bool:
+        """Credit a month's interest unless that month was already posted"""
+        acc_no = str(account.account_number)
+        ok, result = self.engine.post({acc_no: amount}, "interest_month", month)
+        if not ok:
+            print(f"Interest not posted: {result}")
+            return False
+        if acc_no not in result:
+            print(f"Interest for {month} was already posted!")
+            return False
+        account.interest_month = month
+        self.saved_details[account.account_number] = self.account_details(account)
+        account.post_interest(amount, result[acc_no])
+        self.save_all_transactions()
+        return True
+    
+    def _add(self, account: BankAccount, index: bool = True):
+        self.accounts[account.account_number] = account
+        account.store = self._adjust
+        account.on_change = self.rankings.update
+        if index:
+            account.notify_change()
+            self.names.add(account.account_number, account.account_holder)
+    
+    def top_balances(self, n: int = 10) -> list:
+        """[(account_number, balance)] for the n largest balances"""
+        return self.rankings.top_balances(n)
+    
+    def most_active(self, n: int = 10) -> list:
+        """[(account_number, transaction count)] for the n busiest accounts"""
+        return self.rankings.most_active(n)
+    
+    def top_movers(self, n: int = 10) -> list:
+        """[(account_number, balance change)] for the n largest changes since mark_movers()"""
+        return self.rankings.top_movers(n)
+    
+    def mark_movers(self):
+        self.rankings.mark()
+    
+    def accounts_below(self, threshold: int, limit: int = None) -> list:
+        """[(account_number, balance)] under threshold, lowest first"""
+        return self.rankings.below(threshold, limit)
+    
+    def find_accounts(self, name: str, page: int = 0, page_size: int = PAGE_SIZE) -> list:
+        """Accounts whose holder has a name starting with `name`; close matches if none"""
+        # The mode depends on the query alone, so every page of it uses the same one.
+        if self.names.prefix(name, 0, 1):
+            matches = self.names.prefix(name, page, page_size)
+        else:
+            matches = [(number, holder) for number, holder, _ in
+                       self.names.fuzzy(name, page, page_size)]
+        return [self.accounts[number] for number, _ in matches]
     
     def get_account(self, account_number: int) -> Optional[BankAccount]:
         """Retrieve account by number"""
         return self.accounts.get(account_number)
     
-    def save_accounts(self):
-        """Save all accounts to CSV"""
+    def shard_account(self, account_number: int, shards: int = SHARD_COUNT) -> bool:
+        """Back a business account's in-memory balance with independently locked sub-balances"""
+        account = self.accounts.get(account_number)
+        if not isinstance(account, BusinessAccount):
+            print("Only business accounts can be sharded!")
+            return False
+        account.enable_sharding(shards)
+        return True
+    
+    def snapshot(self) -> dict:
+        """Point-in-time view of every account, for reports"""
+        return {number: account.snapshot() for number, account in list(self.accounts.items())}
+    
+    @staticmethod
+    def account_row(account: BankAccount) -> dict:
+        """Account as a row of the common account schema"""
+        return {
+            'account_number': str(account.account_number),
+            'name': account.account_holder,
+            'balance': format_cents(account.balance),
+            'status': 'active' if account.is_active else 'inactive',
+            'account_type': account.account_type.value,
+            'interest_month': account.interest_month
+        }
+    
+    @staticmethod
+    def account_details(account: BankAccount) -> tuple:
+        """The account's columns other than its number and balance"""
+        return (account.account_holder, 'active' if account.is_active else 'inactive',
+                account.account_type.value, account.interest_month)
+    
+    @staticmethod
+    def transaction_rows(accounts) -> list:
+        """Ledger rows for transactions not saved yet; marks them saved"""
+        rows = []
+        for account in accounts:
+            for transaction in account.transactions[account.saved_transactions:]:
+                rows.append([new_id(),
+                             str(account.account_number),
+                             PROJECT_TYPES[transaction.transaction_type.value],
+                             format_cents(transaction.amount),
+                             transaction.timestamp,
+                             PROJECT_STATUSES.get(transaction.status, transaction.status)])
+            account.saved_transactions = len(account.transactions)
+        return rows
+    
+    def save_accounts(self, accounts=None):
+        """Save new accounts and changed account details through the storage engine
+
+        Balances are stored as they move, so only the other columns are
+        written for accounts already saved.
+        """
         try:
-            with open(self.accounts_file, 'w', newline='') as csvfile:
-                fieldnames = ['AccountNumber', 'AccountHolder', 'AccountType', 'Balance']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for account in self.accounts.values():
-                    writer.writerow({
-                        'AccountNumber': account.account_number,
-                        'AccountHolder': account.account_holder,
-                        'AccountType': account.account_type.value,
-                        'Balance': account.balance
-                    })
+            rows = []
+            for account in self.accounts.values() if accounts is None else accounts:
+                details = self.account_details(account)
+                if self.saved_details.get(account.account_number) != details:
+                    rows.append(self.account_row(account))
+                    self.saved_details[account.account_number] = details
+            self.engine.put_accounts(rows)
+            self.engine.flush()
             print(f"Accounts saved to {self.accounts_file}")
         except Exception as e:
             print(f"Error saving accounts: {e}")
     
     def save_all_transactions(self):
-        """Save all transactions to CSV"""
+        """Append transactions not yet in the ledger"""
         try:
-            with open(self.transactions_file, 'w', newline='') as csvfile:
-                fieldnames = ['AccountNumber', 'TransactionID', 'Type', 'Amount', 'Timestamp', 'Status']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                writer.writeheader()
-                for account in self.accounts.values():
-                    for transaction in account.transactions:
-                        writer.writerow({
-                            'AccountNumber': account.account_number,
-                            'TransactionID': transaction.transaction_id,
-                            'Type': transaction.transaction_type.value,
-                            'Amount': transaction.amount,
-                            'Timestamp': transaction.timestamp,
-                            'Status': transaction.status
-                        })
+            self.engine.log(self.transaction_rows(self.accounts.values()))
+            self.engine.flush()
             print(f"Transactions saved to {self.transactions_file}")
         except Exception as e:
             print(f"Error saving transactions: {e}")
     
     def load_accounts(self):
-        """Load accounts from CSV"""
-        if not os.path.exists(self.accounts_file):
-            print("No previous account data found.")
-            return
-        
+        """Load accounts from the storage engine"""
         try:
-            with open(self.accounts_file, 'r') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    account_number = int(row['AccountNumber'])
-                    account_holder = row['AccountHolder']
-                    account_type_str = row['AccountType']
-                    balance = float(row['Balance'])
-                    
-                    # Convert string to AccountType enum
-                    account_type = AccountType.SAVINGS if account_type_str == "Savings" else \
-                                  AccountType.CHECKING if account_type_str == "Checking" else \
-                                  AccountType.BUSINESS
-                    
-                    # Create appropriate account type
-                    if account_type == AccountType.SAVINGS:
-                        account = SavingsAccount(account_holder, balance, account_number)
-                    elif account_type == AccountType.CHECKING:
-                        account = CheckingAccount(account_holder, balance, account_number)
-                    else:
-                        account = BusinessAccount(account_holder, balance, account_number)
-                    
-                    self.accounts[account_number] = account
+            loaded = []
+            for row in self.engine.accounts().values():
+                try:
+                    account_number = int(row['account_number'])
+                except ValueError:
+                    continue
+                account_holder = row['name']
+                account_type_str = row['account_type']
+                # The shared balance table's balance when one is attached
+                stored = self.engine.get_account(row['account_number'], active_only=False)
+                balance = to_cents(stored['balance'])
+                
+                # Convert string to AccountType enum
+                account_type = AccountType.SAVINGS if account_type_str == "Savings" else \
+                              AccountType.CHECKING if account_type_str == "Checking" else \
+                              AccountType.BUSINESS
                 
+                # Create appropriate account type
+                if account_type == AccountType.SAVINGS:
+                    account = SavingsAccount(account_holder, balance, account_number)
+                elif account_type == AccountType.CHECKING:
+                    account = CheckingAccount(account_holder, balance, account_number)
+                else:
+                    account = BusinessAccount(account_holder, balance, account_number)
+                account.is_active = row['status'] == 'active'
+                account.interest_month = row['interest_month']
+                self.saved_details[account_number] = self.account_details(account)
+                
+                self._add(account, index=False)
+                loaded.append(account)
+            
+            # Indexes are built in bulk rather than one insert per account
+            self.rankings.add_many((account.account_number, account.balance, len(account.transactions),
+                                    account.version) for account in loaded)
+            self.names.add_many((account.account_number, account.account_holder) for account in loaded)
+            
+            if not self.accounts:
+                print("No previous account data found.")
+                return
             print(f"Loaded {len(self.accounts)} accounts from {self.accounts_file}")
         except Exception as e:
             print(f"Error loading accounts: {e}")
     
     def load_transactions(self):
-        """Load transactions from CSV"""
-        if not os.path.exists(self.transactions_file):
-            print("No previous transaction data found.")
-            return
-        
+        """Load transactions from the ledger"""
         try:
-            with open(self.transactions_file, 'r') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    account_number = int(row['AccountNumber'])
-                    transaction_id = int(row['TransactionID'])
-                    transaction_type_str = row['Type']
-                    amount = float(row['Amount'])
-                    timestamp = row['Timestamp']
-                    status = row['Status']
-                    
-                    if account_number in self.accounts:
-                        # Convert string to TransactionType enum
-                        transaction_type = TransactionType.DEPOSIT if transaction_type_str == "Deposit" else \
-                                          TransactionType.WITHDRAWAL if transaction_type_str == "Withdrawal" else \
-                                          TransactionType.TRANSFER
-                        
-                        transaction = Transaction(transaction_id, amount, transaction_type, timestamp)
-                        transaction.status = status
-                        self.accounts[account_number].transactions.append(transaction)
+            for row in self.engine.transactions():
+                try:
+                    account_number = int(row['account_number'])
+                except ValueError:
+                    continue
+                account = self.accounts.get(account_number)
+                if account is None or row['type'] not in TRANSACTION_TYPES:
+                    continue
+                
+                window = account.transactions
+                if window.source is None:
+                    window.source = partial(self.ledger_transactions, account_number)
+                window.append(self.ledger_transaction(row, len(window) + 1), stored=True)
             
+            for account in self.accounts.values():
+                account.saved_transactions = len(account.transactions)
+                account.notify_change()
             print(f"Loaded transactions from {self.transactions_file}")
         except Exception as e:
             print(f"Error loading transactions: {e}")
+    
+    def ledger_transactions(self, account_number: int):
+        """An account's transactions as the ledger has them, oldest first"""
+        rows = (row for row in self.engine.transactions(str(account_number))
+                if row['type'] in TRANSACTION_TYPES)
+        for transaction_id, row in enumerate(rows, 1):
+            yield self.ledger_transaction(row, transaction_id)
+    
+    @staticmethod
+    def ledger_transaction(row: dict, transaction_id: int) -> Transaction:
+        transaction = Transaction(transaction_id, to_cents(row['amount']),
+                                  TRANSACTION_TYPES[row['type']], row['date'])
+        transaction.status = TRANSACTION_STATUSES.get(row['status'], row['status'])
+        return transaction
 
 # Interactive menu system
 def display_main_menu():
@@ -337,6 +638,8 @@ def display_main_menu():
     print("7. View Account Statement")
     print("8. Save Data")
     print("9. Exit")
+    print("10. Post Month-end Interest")
+    print("11. Find Account by Name")
     print("="*60)
 
 def get_account_type():
@@ -362,7 +665,7 @@ def create_account(bank):
         return
     
     try:
-        initial_balance = float(input("Enter initial balance: $"))
+        initial_balance = to_cents(input("Enter initial balance: $"))
         if initial_balance < 0:
             print("Balance cannot be negative!")
             return
@@ -393,9 +696,8 @@ def deposit_money(bank):
             print("Account not found!")
             return
         
-        amount = float(input("Enter deposit amount: $"))
+        amount = to_cents(input("Enter deposit amount: $"))
         if account.deposit(amount):
-            bank.save_accounts()
             bank.save_all_transactions()
     except ValueError:
         print("Invalid input!")
@@ -409,9 +711,8 @@ def withdraw_money(bank):
             print("Account not found!")
             return
         
-        amount = float(input("Enter withdrawal amount: $"))
+        amount = to_cents(input("Enter withdrawal amount: $"))
         if account.withdraw(amount):
-            bank.save_accounts()
             bank.save_all_transactions()
     except ValueError:
         print("Invalid input!")
@@ -426,7 +727,7 @@ def check_balance(bank):
             return
         
         print(f"\nAccount: {account.account_holder}")
-        print(f"Balance: ${account.get_balance():.2f}")
+        print(f"Balance: ${format_cents(account.get_balance())}")
     except ValueError:
         print("Invalid account number!")
 
@@ -434,7 +735,7 @@ def transfer_money(bank):
     try:
         from_account = int(input("Enter source account number: "))
         to_account = int(input("Enter destination account number: "))
-        amount = float(input("Enter transfer amount: $"))
+        amount = to_cents(input("Enter transfer amount: $"))
         bank.transfer(from_account, to_account, amount)
     except ValueError:
         print("Invalid input!")
@@ -448,12 +749,44 @@ def calculate_interest(bank):
             print("Account not found!")
             return
         
-        account.calculate_interest()
-        bank.save_accounts()
-        bank.save_all_transactions()
+        month = datetime.now().strftime("%Y-%m")
+        if account.interest_month >= month:
+            print(f"Interest for {month} was already posted!")
+            return
+        
+        interest = account.calculate_interest()
+        if bank.post_interest(account, interest, month):
+            print(f"Interest added: ${format_cents(interest)}")
     except ValueError:
         print("Invalid account number!")
 
+def post_month_end_interest(bank):
+    from interest import InterestJob
+    
+    month = input("Enter month (YYYY-MM, press Enter for current): ").strip()
+    if month:
+        try:
+            month = datetime.strptime(month, "%Y-%m").strftime("%Y-%m")
+        except ValueError:
+            print("Invalid month!")
+            return
+    InterestJob(bank, month or None).run()
+
+def find_account(bank):
+    name = input("Enter account holder name: ").strip()
+    page = 0
+    while True:
+        accounts = bank.find_accounts(name, page)
+        if not accounts:
+            print("No accounts found!" if page == 0 else "No more accounts.")
+            return
+        for account in accounts:
+            print(f"  {account.account_number}: {account.account_holder} "
+                  f"({account.account_type.value}) ${format_cents(account.balance)}")
+        if len(accounts) < PAGE_SIZE or input("Show more? (y/n): ").strip().lower() != "y":
+            return
+        page += 1
+
 def view_statement(bank):
     try:
         account_num = int(input("Enter account number: "))
@@ -476,13 +809,17 @@ if __name__ == "__main__":
     
     bank = Bank(bank_name)
     
+    import shm
+    if shm.attach():
+        print("Using shared balance table")
+    
     # Load existing data
     bank.load_accounts()
     bank.load_transactions()
     
     while True:
         display_main_menu()
-        choice = input("Enter your choice (1-9): ").strip()
+        choice = input("Enter your choice (1-11): ").strip()
         
         if choice == "1":
             create_account(bank)
@@ -506,5 +843,9 @@ if __name__ == "__main__":
             bank.save_all_transactions()
             print("\nThank you for using Bank Management System!")
             break
+        elif choice == "10":
+            post_month_end_interest(bank)
+        elif choice == "11":
+            find_account(bank)
         else:
             print("Invalid choice! Please try again.")
\ No newline at end of file
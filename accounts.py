@@ -0,0 +1,6 @@
+from engine import engine
+
+class AccountValidation:
+    @staticmethod
+    def get_account(acc_no):
+        return engine.get_account(acc_no)
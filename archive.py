@@ -0,0 +1,153 @@
+import csv
+import gzip
+import io
+import json
+import lzma
+import os
+import sys
+from datetime import datetime
+from file_setup import notifications_file
+from scan import scan
+from storage import FileLock
+
+ARCHIVE_DIR = "archive"
+ARCHIVE_BLOCK_ROWS = 4096
+ARCHIVE_CODEC = "gzip"
+
+# Each block is compressed as its own gzip member / xz stream, so a block can
+# be decompressed on its own and the whole file is still a valid .gz / .xz.
+CODECS = {
+    "gzip": (gzip.compress, gzip.decompress, ".gz"),
+    "xz": (lzma.compress, lzma.decompress, ".xz"),
+}
+
+NOTIFICATION_FIELDS = ["notification_id", "account_number", "message", "date"]
+
+
+def compress_csv(src, dst, codec=ARCHIVE_CODEC, block_rows=ARCHIVE_BLOCK_ROWS,
+                 id_field=None, date_field="date"):
+    """Compress a CSV file into independently readable blocks.
+
+    Writes dst and a dst + ".idx" JSON index holding, for each block, its
+    byte offset and length plus the id and date range of its rows.
+    """
+    compress = CODECS[codec][0]
+    blocks = []
+    tmp = dst + ".tmp"
+    with open(src, "r", newline="") as f, open(tmp, "wb") as out:
+        reader = csv.reader(f)
+        fields = next(reader)
+        id_col = fields.index(id_field) if id_field else 0
+        date_col = fields.index(date_field)
+
+        def flush(rows):
+            buf = io.StringIO()
+            csv.writer(buf).writerows(rows)
+            data = compress(buf.getvalue().encode())
+            ids = [r[id_col] for r in rows]
+            dates = [r[date_col] for r in rows]
+            blocks.append({"offset": out.tell(), "length": len(data), "rows": len(rows),
+                           "min_id": min(ids), "max_id": max(ids),
+                           "start": min(dates), "end": max(dates)})
+            out.write(data)
+
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= block_rows:
+                flush(rows)
+                rows = []
+        if rows:
+            flush(rows)
+        out.flush()
+        os.fsync(out.fileno())
+
+    index = {"codec": codec, "fields": fields, "blocks": blocks,
+             "source_bytes": os.path.getsize(src), "archive_bytes": os.path.getsize(tmp)}
+    with open(dst + ".idx", "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, dst)
+    return index
+
+
+class Archive:
+    def __init__(self, path):
+        self.path = path
+        with open(path + ".idx", "r") as f:
+            self.index = json.load(f)
+        self.fields = self.index["fields"]
+        self.decompress = CODECS[self.index["codec"]][1]
+
+    def blocks(self, since=None, until=None, id_from=None, id_to=None):
+        for block in self.index["blocks"]:
+            if since is not None and block["end"] < since:
+                continue
+            if until is not None and block["start"] > until:
+                continue
+            if id_from is not None and block["max_id"] < id_from:
+                continue
+            if id_to is not None and block["min_id"] > id_to:
+                continue
+            yield block
+
+    def rows(self, since=None, until=None, id_from=None, id_to=None, match=None):
+        # Streams rows of the matching blocks only; nothing is written to disk.
+        # match=(field, value) byte-searches each block instead of parsing it.
+        with open(self.path, "rb") as f:
+            for block in self.blocks(since, until, id_from, id_to):
+                f.seek(block["offset"])
+                data = self.decompress(f.read(block["length"]))
+                if match:
+                    field, value = match
+                    yield from scan(data, self.fields, self.fields.index(field), value)
+                    continue
+                for row in csv.reader(io.StringIO(data.decode())):
+                    yield dict(zip(self.fields, row))
+
+
+def rotate_notifications(codec=ARCHIVE_CODEC, directory=ARCHIVE_DIR):
+    """Close the current notifications file and compress it into the archive"""
+    os.makedirs(directory, exist_ok=True)
+    with FileLock(notifications_file):
+        if not os.path.exists(notifications_file):
+            return None
+        with open(notifications_file, "r") as f:
+            if sum(1 for _ in f) <= 1:
+                return None
+        stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        closed = os.path.join(directory, f"notifications-{stamp}.csv")
+        os.replace(notifications_file, closed)
+        with open(notifications_file, "w", newline="") as f:
+            csv.writer(f).writerow(NOTIFICATION_FIELDS)
+
+    dst = closed + CODECS[codec][2]
+    compress_csv(closed, dst, codec, id_field="notification_id")
+    os.remove(closed)
+    return dst
+
+
+def notification_archives(directory=ARCHIVE_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith("notifications-") and name.endswith((".gz", ".xz")))
+
+
+def archived_notifications(acc_no=None, since=None, until=None, directory=ARCHIVE_DIR):
+    match = None if acc_no is None else ("account_number", acc_no)
+    for path in notification_archives(directory):
+        yield from Archive(path).rows(since, until, match=match)
+
+
+if __name__ == "__main__":
+    from ledger import ledger
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    codec = sys.argv[2] if len(sys.argv) > 2 else ARCHIVE_CODEC
+
+    for segment in ledger.archive(days, codec):
+        print(f"Archived {segment['file']}: {segment['rows']} rows, "
+              f"{segment['source_bytes']} -> {segment['archive_bytes']} bytes")
+    rotated = rotate_notifications(codec)
+    if rotated:
+        print(f"Archived notifications to {rotated}")
@@ -1,19 +1,15 @@
-import csv
-from file_setup import accounts_file
+from engine import engine
 
 class BalanceManagement:
     @staticmethod
     def update_balance(acc_no, new_balance):
-        rows = []
-        with open(accounts_file, "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row["account_number"] == acc_no:
-                    row["balance"] = str(new_balance)
-                rows.append(row)
+        # Overwrites whatever moved since new_balance was worked out; adjust()
+        # is the safe way to change a balance.
+        if engine.get_account(acc_no, active_only=False) is not None:
+            engine.put_balances({acc_no: new_balance})
+            engine.flush()
 
-        with open(accounts_file, "w", newline="") as f:
-            writer = csv.DictWriter(f,
-                fieldnames=["account_number","name","balance","status"])
-            writer.writeheader()
-            writer.writerows(rows)
+    @staticmethod
+    def adjust(mutations):
+        # mutations: [(acc_no, delta, floor)] in cents, applied together or not at all
+        return engine.adjust(mutations)
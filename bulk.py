@@ -0,0 +1,114 @@
+import csv
+import sys
+from datetime import datetime
+from file_setup import accounts_file
+from fraud import bulk_engine
+from idgen import new_id
+from ledger import ledger
+from money import to_cents, format_cents
+from notification import get_writer
+from storage import FileLock, read_table, write_table, group_commit
+import shm
+
+BULK_TYPES = ("DEPOSIT", "WITHDRAW")
+FEED_FIELDS = ["account_number", "type", "amount"]
+
+
+class BulkIngest:
+    @staticmethod
+    def run(feed_path, rejects_path=None):
+        if rejects_path is None:
+            rejects_path = feed_path + ".rejects.csv"
+
+        if shm.serving():
+            # Its balances would not see this load, and workers check floors there.
+            print("A shared balance table is being served; stop it before a bulk load")
+            return 0, 0
+
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ledger_rows = []
+        notification_rows = []
+        rejects = []
+        alerts = 0
+
+        with FileLock(accounts_file):
+            # Anything other processes already journaled goes in first, so
+            # the snapshot below is the latest table.
+            group_commit.commit_pending()
+            fieldnames, rows = read_table(accounts_file)
+            accounts = {row["account_number"]: row for row in rows
+                        if row["status"] == "active"}
+            balances = {acc_no: to_cents(row["balance"]) for acc_no, row in accounts.items()}
+
+            with open(feed_path, "r", newline="") as f:
+                reader = csv.DictReader(f)
+                if not set(FEED_FIELDS) <= set(reader.fieldnames or []):
+                    print(f"Feed must have columns: {', '.join(FEED_FIELDS)}")
+                    return 0, 0
+                for line_no, feed in enumerate(reader, start=2):
+                    acc_no = feed["account_number"]
+                    t_type = feed["type"].strip().upper()
+                    reason = None
+                    try:
+                        amount = to_cents(feed["amount"])
+                    except ValueError:
+                        amount = None
+
+                    if acc_no not in balances:
+                        reason = "Invalid account"
+                    elif t_type not in BULK_TYPES:
+                        reason = "Invalid type"
+                    elif amount is None or amount <= 0:
+                        reason = "Invalid amount"
+                    elif t_type == "WITHDRAW" and balances[acc_no] < amount:
+                        reason = "Insufficient balance"
+
+                    if reason:
+                        rejects.append([line_no, acc_no, feed["type"], feed["amount"], reason])
+                        continue
+
+                    if bulk_engine.check(acc_no, amount):
+                        alerts += 1
+
+                    if t_type == "DEPOSIT":
+                        balances[acc_no] += amount
+                        message = (f"Deposited {format_cents(amount)}. "
+                                   f"New Balance: {format_cents(balances[acc_no])}")
+                    else:
+                        balances[acc_no] -= amount
+                        message = (f"Withdrawn {format_cents(amount)}. "
+                                   f"New Balance: {format_cents(balances[acc_no])}")
+                    ledger_rows.append([new_id(), acc_no, t_type, format_cents(amount), date,
+                                        "SUCCESS"])
+                    notification_rows.append([new_id(), acc_no, message, date])
+
+            if ledger_rows:
+                # The ledger is written before the balances move, still under
+                # the lock: a crash in between leaves rows that reconcile
+                # reports against the old balances instead of balances that
+                # no ledger row explains.
+                ledger.append(ledger_rows)
+                get_writer().write_rows(notification_rows)
+                for acc_no, balance in balances.items():
+                    accounts[acc_no]["balance"] = format_cents(balance)
+                write_table(accounts_file, rows, fieldnames)
+
+        if rejects:
+            with open(rejects_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["line", "account_number", "type", "amount", "reason"])
+                writer.writerows(rejects)
+
+        print(f"Applied {len(ledger_rows)} rows, rejected {len(rejects)}")
+        if rejects:
+            print(f"Rejected rows written to {rejects_path}")
+        if alerts:
+            print(f"⚠ Warning: {alerts} rows raised fraud alerts")
+        return len(ledger_rows), len(rejects)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python bulk.py <feed.csv>")
+        sys.exit(1)
+    BulkIngest.run(sys.argv[1])
@@ -0,0 +1,237 @@
+import json
+import os
+import re
+import socket
+import sys
+
+# Only the standard library is imported up front: a client that hands its
+# command to a running server never loads the banking modules at all.
+
+SOCKET_PATH = "bank.sock"
+CLIENT_TIMEOUT = 30.0
+REQUEST_TIMEOUT = 5.0
+MAX_REQUEST = 64 * 1024
+
+_ready = False
+
+
+def setup():
+    """One-time start-up work: data files, shared balances, fraud windows"""
+    global _ready
+    if _ready:
+        return
+    from file_setup import FileSetup
+    from fraud import FraudDetection
+    import shm
+    FileSetup.create_files()
+    if shm.attach():
+        print("Using shared balance table")
+    FraudDetection.warm()
+    _ready = True
+
+
+# commands: print their output, return something falsy on failure
+
+def deposit(acc, amount, key=None):
+    from deposit import Deposit
+    from money import to_cents
+    return Deposit(acc, to_cents(amount), "DEPOSIT").process(key)
+
+
+def withdraw(acc, amount, key=None):
+    from withdrawal import Withdrawal
+    from money import to_cents
+    return Withdrawal(acc, to_cents(amount), "WITHDRAW").process(key)
+
+
+def transfer(sender, receiver, amount, key=None):
+    from transfer import FundTransfer
+    from money import to_cents
+    return FundTransfer.transfer(sender, receiver, to_cents(amount), key)
+
+
+def history(acc):
+    from history import TransactionHistory
+    TransactionHistory.view(acc)
+    return True
+
+
+def reverse(tid):
+    from reversal import TransactionReversal
+    TransactionReversal.reverse(tid)
+    return True
+
+
+def report():
+    from report import TransactionReport
+    TransactionReport.generate()
+    return True
+
+
+def notifications(acc, before=None):
+    from notification import Notification
+    rows, cursor = Notification.inbox(acc, before=None if before is None else int(before))
+    for row in rows:
+        print(f"{row['date']}  {row['message']}")
+    if cursor is not None:
+        print(f"More: notifications {acc} {cursor}")
+    return True
+
+
+COMMANDS = {
+    "deposit": (deposit, "ACCOUNT AMOUNT [KEY]"),
+    "withdraw": (withdraw, "ACCOUNT AMOUNT [KEY]"),
+    "transfer": (transfer, "SENDER RECEIVER AMOUNT [KEY]"),
+    "history": (history, "ACCOUNT"),
+    "reverse": (reverse, "TRANSACTION_ID"),
+    "report": (report, ""),
+    "notifications": (notifications, "ACCOUNT [CURSOR]"),
+}
+
+
+def _is_amount(text):
+    from money import to_cents
+    try:
+        to_cents(text)
+    except ValueError:
+        return False
+    return True
+
+
+_is_number = re.compile(r"[0-9]+").fullmatch
+
+# What each argument named in COMMANDS has to look like
+ARG_CHECKS = {
+    "ACCOUNT": _is_number,
+    "SENDER": _is_number,
+    "RECEIVER": _is_number,
+    "AMOUNT": _is_amount,
+    "KEY": lambda text: bool(text) and text.isprintable(),
+    "TRANSACTION_ID": str.isalnum,
+    "CURSOR": _is_number,
+}
+
+
+def usage():
+    print("Usage: python main.py [serve | COMMAND ARGS...]")
+    for name, (_, args) in COMMANDS.items():
+        print(f"  {name} {args}".rstrip())
+
+
+def run(argv):
+    """Run one command in this process; returns the exit status"""
+    if not argv or argv[0] not in COMMANDS:
+        usage()
+        return 2
+    command, args = COMMANDS[argv[0]]
+    args = args.split()
+    required = sum(1 for arg in args if not arg.startswith("["))
+    if not required <= len(argv) - 1 <= len(args):
+        print(f"Usage: {argv[0]} {' '.join(args)}".rstrip())
+        return 2
+    for name, value in zip(args, argv[1:]):
+        name = name.strip("[]")
+        if not ARG_CHECKS[name](value):
+            print(f"Invalid {name.lower().replace('_', ' ')}: {value!r}")
+            return 2
+    setup()
+    from engine import engine
+    try:
+        result = command(*argv[1:])
+    finally:
+        # One ledger write per command, however many rows it logged.
+        engine.flush()
+    # A balance of 0 is a result too.
+    return 1 if result is None or result is False else 0
+
+
+# server
+
+def _handle(conn):
+    import contextlib
+    import io
+    conn.settimeout(REQUEST_TIMEOUT)
+    try:
+        line = conn.makefile("rb").readline(MAX_REQUEST)
+        argv = json.loads(line)["argv"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            status = run([str(arg) for arg in argv])
+        except Exception as e:
+            print(f"Error: {e}")
+            status = 1
+    try:
+        conn.sendall((json.dumps({"status": status, "output": output.getvalue()}) + "\n").encode())
+    except OSError:
+        pass
+
+
+def serve(path=SOCKET_PATH):
+    """Answer commands from clients on a Unix socket until interrupted.
+
+    Commands run one at a time in this process, so account tables, ledger
+    manifests, indexes and fraud windows stay loaded between them.
+    """
+    import signal
+    if os.path.exists(path):
+        sock = _connect(path)
+        if sock is not None:
+            sock.close()
+            print(f"Already serving on {path}")
+            return
+        os.remove(path)
+    setup()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)  # socket usable by this user only
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen(64)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Serving on {path}, Ctrl-C to stop")
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn:
+                _handle(conn)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(path)
+
+
+# client
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send(argv, path=SOCKET_PATH):
+    """Run a command on the server; its exit status, or None if none is running"""
+    if not os.path.exists(path):
+        return None
+    sock = _connect(path)
+    if sock is None:
+        return None
+    with sock:
+        sock.settimeout(CLIENT_TIMEOUT)
+        sock.sendall((json.dumps({"argv": argv}) + "\n").encode())
+        reply = sock.makefile("rb").readline()
+    if not reply:
+        # The command may or may not have run; running it again is not safe.
+        print("No reply from server")
+        return 1
+    reply = json.loads(reply)
+    sys.stdout.write(reply["output"])
+    return reply["status"]
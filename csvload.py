@@ -0,0 +1,170 @@
+import csv
+import itertools
+import sys
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SAMPLE_ROWS = 1000
+CHUNK_ROWS = 100000
+
+# Column kinds, narrowest first. A column only ever moves to a wider kind.
+# Empty cells in numeric columns load as NaN (which makes the column float).
+INT, FLOAT, STR = "q", "d", "str"
+
+
+def _kind(value):
+    try:
+        int(value)
+        return INT
+    except ValueError:
+        pass
+    try:
+        float(value)
+        return FLOAT
+    except ValueError:
+        return STR
+
+
+def infer_types(header, sample, types=None):
+    # types: {column: kind} for columns whose kind is fixed, not inferred
+    types = types or {}
+    kinds = [types.get(name, INT) for name in header]
+    for row in sample:
+        for i, value in enumerate(row[:len(header)]):
+            if kinds[i] == STR or value == "" or header[i] in types:
+                continue
+            kind = _kind(value)
+            if kind == STR or (kind == FLOAT and kinds[i] == INT):
+                kinds[i] = kind
+    return kinds
+
+
+def _new_column(kind):
+    return [] if kind == STR else array(kind)
+
+
+def _widen(column, kind):
+    if kind == STR:
+        return [str(v) for v in column]
+    return array(kind, column)
+
+
+class _Columns:
+    def __init__(self, header, kinds):
+        self.header = header
+        self.kinds = list(kinds)
+        self.columns = [_new_column(k) for k in kinds]
+
+    def add(self, row):
+        for i, kind in enumerate(self.kinds):
+            value = row[i] if i < len(row) else ""
+            if kind == STR:
+                self.columns[i].append(value)
+                continue
+            try:
+                self.columns[i].append(int(value) if kind == INT else float(value or "nan"))
+            except ValueError:
+                # The sample missed a wider value: widen this column in place.
+                new_kind = FLOAT if value == "" else _kind(value)
+                if new_kind == INT:
+                    new_kind = FLOAT
+                self.kinds[i] = new_kind
+                self.columns[i] = _widen(self.columns[i], new_kind)
+                self.columns[i].append(value if new_kind == STR else float(value or "nan"))
+
+    def result(self, as_numpy=False):
+        out = {}
+        for name, kind, column in zip(self.header, self.kinds, self.columns):
+            if as_numpy and np is not None and kind != STR:
+                column = np.frombuffer(column, dtype=kind)
+            out[name] = column
+        return out
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS, sample_rows=SAMPLE_ROWS, as_numpy=False,
+                types=None):
+    """Stream a CSV file as {column: typed buffer} chunks of chunk_rows rows.
+
+    Types are inferred from the first sample_rows rows, except for columns
+    given a kind in types (such as STR for codes with leading zeros), and
+    carried from chunk to chunk; numeric columns are array('q') / array('d') (numpy
+    arrays with as_numpy=True and numpy installed), text columns are lists.
+    Quoted fields are handled by the csv module. Only one chunk is held in
+    memory at a time.
+    """
+    with open(path, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = [h.strip() for h in header]
+        sample = list(itertools.islice(reader, sample_rows))
+        kinds = infer_types(header, sample, types)
+
+        columns = _Columns(header, kinds)
+        for row in itertools.chain(sample, reader):
+            if not row:
+                continue
+            columns.add(row)
+            if len(columns.columns[0]) >= chunk_rows:
+                yield columns.result(as_numpy)
+                columns = _Columns(header, columns.kinds)
+        if len(columns.columns[0]) or not sample:
+            yield columns.result(as_numpy)
+
+
+def load_columns(path, sample_rows=SAMPLE_ROWS, as_numpy=False, types=None):
+    """Whole CSV file as {column: typed buffer}, read in a single pass"""
+    for chunk in iter_chunks(path, sys.maxsize, sample_rows, as_numpy, types):
+        return chunk
+    return {}
+
+
+def _legacy_load(path):
+    # The readlines / split / try-int approach used by Oops.py and Program.py.
+    with open(path, "r") as f:
+        lines = [line.strip() for line in f.readlines()]
+    header = lines[0].split(",")
+    data = {h: [] for h in header}
+    for line in lines[1:]:
+        values = line.split(",")
+        for i in range(len(header)):
+            value = values[i]
+            try:
+                if "." in value:
+                    data[header[i]].append(float(value))
+                else:
+                    data[header[i]].append(int(value))
+            except ValueError:
+                data[header[i]].append(value)
+    return data
+
+
+if __name__ == "__main__":
+    import os
+    import random
+    import tracemalloc
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    path = "csvload_bench.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["user_name", "passcode", "status", "score"])
+        for i in range(rows):
+            writer.writerow([f"user{i}", random.randint(1000, 9999),
+                             random.randint(0, 1), round(random.random() * 100, 2)])
+
+    for name, fn in (("readlines/split", _legacy_load), ("csvload", load_columns)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn(path)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:16} {elapsed:6.2f}s  peak {peak / 1e6:7.1f} MB")
+    os.remove(path)
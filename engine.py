@@ -0,0 +1,260 @@
+import atexit
+import os
+from file_setup import accounts_file
+from ledger import ledger
+from money import to_cents, format_cents
+from storage import ACCOUNT_FIELDS, FileLock, normalize_account, parse_table, read_table, \
+    write_table, group_commit
+
+ENGINE_BATCH_SIZE = 1000
+
+
+class StorageEngine:
+    """Account and ledger storage shared by main.py and Project.Bank.
+
+    Accounts are kept in memory and reloaded only when the table file
+    changes on disk. Balance moves go through the group commit; row writes
+    (new accounts, changed account details) and ledger rows are buffered
+    and persisted together, one table rewrite and one ledger append per
+    batch. Transactions are only ever appended.
+    """
+
+    def __init__(self, path=accounts_file, ledger=ledger, commit=group_commit,
+                 batch_size=ENGINE_BATCH_SIZE):
+        self.path = path
+        self.ledger = ledger
+        self.commit = commit
+        self.batch_size = batch_size
+        self.dirty = {}
+        self.dirty_balances = {}
+        self.pending = []
+        self._accounts = {}
+        self._version = None
+        self.balances = None
+
+    # accounts
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_ino, st.st_size
+
+    def accounts(self):
+        """{account_number: row} for every account, refreshed if the table changed"""
+        version = self._stat()
+        if version != self._version:
+            rows = read_table(self.path)[1] if version is not None else []
+            self._accounts = {row["account_number"]: row for row in rows}
+            for row in self.dirty.values():
+                self._merge(row)
+            for acc_no, balance in self.dirty_balances.items():
+                if acc_no in self._accounts:
+                    self._accounts[acc_no] = dict(self._accounts[acc_no],
+                                                  balance=format_cents(balance))
+            self._version = version
+        return self._accounts
+
+    def _merge(self, row):
+        # A buffered row keeps the balance already stored for its account.
+        current = self._accounts.get(row["account_number"])
+        if current is not None:
+            row = dict(row, balance=current["balance"])
+        self._accounts[row["account_number"]] = row
+
+    def get_account(self, acc_no, active_only=True):
+        row = self.accounts().get(acc_no)
+        if row is None or (active_only and row["status"] != "active"):
+            return None
+        if self.balances is not None:
+            balance = self.balances.get(acc_no)
+            if balance is not None:
+                return dict(row, balance=format_cents(balance))
+        return row
+
+    def attach_balances(self, table):
+        """Keep balances in a shared shm.BalanceTable instead of the table file
+
+        Balance moves then go straight to shared memory; the process serving
+        the table persists them. Other columns still come from the file.
+        """
+        self.balances = table
+
+    def put_accounts(self, rows):
+        """Insert new accounts, or replace the other columns of existing ones
+
+        Balances of existing accounts only move through adjust(), so the
+        balance in a row for one is ignored. Written on the next flush.
+        """
+        for row in rows:
+            row = normalize_account(row)
+            self.dirty[row["account_number"]] = row
+            self._merge(row)
+            if self.balances is not None:
+                # Does nothing for an account the table already holds.
+                self.balances.add(row["account_number"], to_cents(row["balance"]))
+        if len(self.dirty) >= self.batch_size:
+            self.flush()
+
+    def put_balances(self, balances):
+        """Overwrite balances {acc_no: cents}
+
+        Moves committed since the caller worked the balances out are lost;
+        adjust() is the safe way. With a shared table attached the table is
+        written, otherwise the file on the next flush.
+        """
+        if self.balances is not None:
+            for acc_no, balance in balances.items():
+                self.balances.set(acc_no, balance)
+            return
+        for acc_no, balance in balances.items():
+            self.dirty_balances[acc_no] = balance
+            if acc_no in self._accounts:
+                self._accounts[acc_no] = dict(self._accounts[acc_no], balance=format_cents(balance))
+
+    def adjust(self, mutations):
+        # mutations: [(acc_no, delta, floor)] in cents, applied together or not
+        # at all; returns (True, {acc_no: balance in cents}) or (False, reason)
+        if self.balances is not None:
+            return self._adjust_shared(mutations)
+        if self.dirty or self.dirty_balances:
+            self.flush()
+        ok, result = self.commit.submit(mutations)
+        if ok:
+            for acc_no, balance in result.items():
+                if acc_no in self._accounts:
+                    self._accounts[acc_no]["balance"] = format_cents(balance)
+        return ok, result
+
+    def _adjust_shared(self, mutations):
+        accounts = self.accounts()
+        for acc_no, _, _ in mutations:
+            row = accounts.get(acc_no)
+            if row is None or row["status"] != "active":
+                return False, "INVALID"
+            if self.balances.get(acc_no) is None:
+                # Opened after the table was loaded.
+                self.balances.add(acc_no, to_cents(row["balance"]))
+        return self.balances.adjust(mutations)
+
+    def post(self, credits, field=None, value=None):
+        """Add credits {acc_no: cents} and set field to value, in one table write
+
+        Accounts whose field already holds value or a later one (field holds
+        something ordered, such as a YYYY-MM month) are left alone, so
+        posting the same credits again after a crash adds nothing. Without
+        a field every active account is credited; credits may be negative
+        and no floor is checked. Returns (True, {acc_no: new balance in
+        cents}) for the accounts changed, or (False, reason).
+        """
+        if self.balances is not None:
+            # The credit would land in shared memory and the marker in the
+            # file; a crash between the two could post it twice.
+            return False, "SHARED"
+        changed = {}
+        if not credits:
+            return True, changed
+        self.flush()
+        with FileLock(self.path):
+            self.commit.commit_pending()
+            fieldnames, rows = read_table(self.path)
+            index = {row["account_number"]: row for row in rows}
+            for acc_no, amount in credits.items():
+                row = index.get(acc_no)
+                if row is None or row["status"] != "active":
+                    continue
+                if field is not None:
+                    if row[field] >= value:
+                        continue
+                    row[field] = value
+                balance = to_cents(row["balance"]) + amount
+                row["balance"] = format_cents(balance)
+                changed[acc_no] = balance
+            if changed:
+                write_table(self.path, rows, fieldnames)
+        return True, changed
+
+    # ledger
+
+    def log(self, rows):
+        """Queue transaction rows (lists in TRANSACTION_FIELDS order) for the ledger"""
+        self.pending.extend(rows)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def transactions(self, acc_no=None, **filters):
+        if self.pending:
+            self.flush()
+        return self.ledger.rows(acc_no, **filters)
+
+    def snapshot(self):
+        """Read-only view of accounts and ledger as they are now"""
+        self.flush()
+        return Snapshot(self)
+
+    # persistence
+
+    def flush(self):
+        if self.dirty or self.dirty_balances:
+            with FileLock(self.path):
+                # Journaled balance moves go in first so they are part of
+                # the table written below.
+                self.commit.commit_pending()
+                # The cache (buffered rows included) is only rebuilt from
+                # the file if someone else wrote it since it was loaded.
+                self.accounts()
+                write_table(self.path, list(self._accounts.values()), ACCOUNT_FIELDS)
+                self._version = self._stat()
+            self.dirty.clear()
+            self.dirty_balances.clear()
+        if self.pending:
+            self.ledger.append(self.pending)
+            self.pending = []
+
+
+class Snapshot:
+    """Accounts and ledger as of one moment.
+
+    The account table is replaced, never rewritten in place, so holding the
+    file open keeps this version readable however many commits follow. The
+    ledger side is a LedgerSnapshot. Both are taken under a shared table
+    lock, so no commit lands between them; writers wait only that long.
+    """
+
+    def __init__(self, engine):
+        with FileLock(engine.path, shared=True):
+            try:
+                self._table = open(engine.path, "r", newline="")
+            except FileNotFoundError:
+                self._table = None
+            self.ledger = engine.ledger.snapshot()
+        self._accounts = None
+
+    def accounts(self):
+        if self._accounts is None:
+            rows = parse_table(self._table)[1] if self._table else []
+            self._accounts = {row["account_number"]: row for row in rows}
+            self.close()
+        return self._accounts
+
+    def get_account(self, acc_no):
+        return self.accounts().get(acc_no)
+
+    def transactions(self, acc_no=None, **filters):
+        return self.ledger.rows(acc_no, **filters)
+
+    def close(self):
+        if self._table:
+            self._table.close()
+            self._table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+engine = StorageEngine()
+atexit.register(engine.flush)
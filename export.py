@@ -0,0 +1,243 @@
+import json
+import mmap
+import os
+import sys
+from array import array
+from datetime import datetime
+from file_setup import accounts_file
+from ledger import ledger
+from money import to_cents
+from storage import read_table
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+COLUMNAR_DIR = "columnar"
+ID_WIDTH = 16
+
+# name -> (array typecode, encoding); "S" is a fixed width byte string.
+LEDGER_COLUMNS = {
+    "transaction_id": ("S", "raw"),
+    "account_number": ("q", "int"),
+    "type": ("B", "dict"),
+    "amount": ("q", "cents"),
+    "date": ("q", "epoch"),
+    "status": ("B", "dict"),
+}
+ACCOUNT_COLUMNS = {
+    "account_number": ("q", "int"),
+    "balance": ("q", "cents"),
+    "status": ("B", "dict"),
+}
+
+
+def _epoch(date):
+    return int(datetime.strptime(date, "%Y-%m-%d %H:%M:%S").timestamp())
+
+
+class ColumnWriter:
+    def __init__(self, directory, columns, meta):
+        self.directory = directory
+        self.columns = columns
+        self.meta = meta
+        self.buffers = {name: (bytearray() if code == "S" else array(code))
+                        for name, (code, _) in columns.items()}
+
+    def add(self, row):
+        for name, (code, encoding) in self.columns.items():
+            value = row[name]
+            buf = self.buffers[name]
+            if encoding == "raw":
+                buf += value.encode()[:ID_WIDTH].ljust(ID_WIDTH, b" ")
+            elif encoding == "dict":
+                words = self.meta["dictionaries"].setdefault(name, [])
+                if value not in words:
+                    words.append(value)
+                buf.append(words.index(value))
+            elif encoding == "epoch":
+                buf.append(_epoch(value))
+            elif encoding == "int":
+                buf.append(int(value))
+            elif encoding == "cents":
+                buf.append(to_cents(value))
+            else:
+                buf.append(float(value))
+        self.meta["rows"] += 1
+
+    def flush(self, mode="ab"):
+        for name, buf in self.buffers.items():
+            with open(os.path.join(self.directory, name + ".bin"), mode) as f:
+                if isinstance(buf, array):
+                    buf.tofile(f)
+                else:
+                    f.write(buf)
+            del buf[:]
+
+
+class ColumnarExport:
+    """Copies the ledger and account table into per-column binary files.
+
+    Each column is a flat little-endian array (array module typecodes) in
+    <directory>/<table>/<column>.bin; amounts and balances are int64 cents,
+    so bulk sums over them are exact. Type and status are stored as uint8
+    codes into the dictionaries kept in meta.json. Ledger export is
+    incremental: sealed segments are exported once, the open segment from
+    where the last run stopped, and later reversals patch the status column.
+    """
+
+    def __init__(self, directory=COLUMNAR_DIR):
+        self.directory = directory
+
+    def _meta_path(self, table):
+        return os.path.join(self.directory, table, "meta.json")
+
+    def _load_meta(self, table, columns):
+        path = self._meta_path(table)
+        layout = {name: code for name, (code, _) in columns.items()}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                meta = json.load(f)
+            if meta["columns"] == layout:
+                return meta
+            # Exported with another column layout: start over.
+            for name in meta["columns"]:
+                column = os.path.join(self.directory, table, name + ".bin")
+                if os.path.exists(column):
+                    os.remove(column)
+        return {"rows": 0, "dictionaries": {},
+                "columns": layout,
+                "id_width": ID_WIDTH, "segments": {}, "reversals_offset": 0}
+
+    def _save_meta(self, table, meta):
+        tmp = self._meta_path(table) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, self._meta_path(table))
+
+    def export_ledger(self):
+        table_dir = os.path.join(self.directory, "ledger")
+        os.makedirs(table_dir, exist_ok=True)
+        meta = self._load_meta("ledger", LEDGER_COLUMNS)
+        self._truncate(table_dir, meta)
+        writer = ColumnWriter(table_dir, LEDGER_COLUMNS, meta)
+        reversed_ids = ledger.reversed_ids()
+        added = 0
+
+        for segment in ledger.manifest()["segments"]:
+            done = meta["segments"].get(segment["file"], 0)
+            if done is True:
+                continue
+            for i, row in enumerate(ledger.segment_rows(segment)):
+                if i < done:
+                    continue
+                if row["transaction_id"] in reversed_ids:
+                    row["status"] = "REVERSED"
+                writer.add(row)
+                done += 1
+                added += 1
+            meta["segments"][segment["file"]] = True if segment["sealed"] else done
+
+        writer.flush()
+        self._patch_reversals(table_dir, meta)
+        self._save_meta("ledger", meta)
+        return added
+
+    def _truncate(self, table_dir, meta):
+        # Columns are written before the metadata that counts them; drop
+        # anything a crashed run left past meta["rows"] before appending.
+        for name, code in meta["columns"].items():
+            path = os.path.join(table_dir, name + ".bin")
+            if not os.path.exists(path):
+                continue
+            width = meta["id_width"] if code == "S" else array(code).itemsize
+            if os.path.getsize(path) > meta["rows"] * width:
+                os.truncate(path, meta["rows"] * width)
+
+    def _patch_reversals(self, table_dir, meta):
+        path = ledger.reversals_path
+        if not os.path.exists(path) or meta["rows"] == 0:
+            return
+        codes = meta["dictionaries"].setdefault("status", [])
+        if "REVERSED" not in codes:
+            codes.append("REVERSED")
+        code = codes.index("REVERSED")
+
+        with open(path, "r", newline="") as f:
+            f.seek(meta["reversals_offset"])
+            if meta["reversals_offset"] == 0:
+                f.readline()
+            tids = []
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break
+                tids.append(line.split(",", 1)[0])
+                meta["reversals_offset"] = f.tell()
+        if not tids:
+            return
+
+        with open(os.path.join(table_dir, "transaction_id.bin"), "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as ids, \
+                open(os.path.join(table_dir, "status.bin"), "r+b") as status:
+            for tid in tids:
+                key = tid.encode()[:ID_WIDTH].ljust(ID_WIDTH, b" ")
+                pos = ids.find(key)
+                while pos != -1 and pos % ID_WIDTH:
+                    pos = ids.find(key, pos + 1)
+                if pos != -1:
+                    status.seek(pos // ID_WIDTH)
+                    status.write(bytes([code]))
+
+    def export_accounts(self):
+        # The account table is small and mutable: always a full snapshot.
+        table_dir = os.path.join(self.directory, "accounts")
+        os.makedirs(table_dir, exist_ok=True)
+        meta = {"rows": 0, "dictionaries": {},
+                "columns": {name: code for name, (code, _) in ACCOUNT_COLUMNS.items()}}
+        writer = ColumnWriter(table_dir, ACCOUNT_COLUMNS, meta)
+        for row in read_table(accounts_file)[1]:
+            writer.add(row)
+        writer.flush(mode="wb")
+        self._save_meta("accounts", meta)
+        return meta["rows"]
+
+    def load(self, table, columns=None):
+        """Memory-map the requested columns of an exported table.
+
+        Returns {column: array-like}; numpy memmaps when numpy is installed,
+        otherwise memoryviews cast to the column's typecode. Dictionary
+        encoded columns come back as codes; see dictionaries().
+        """
+        with open(self._meta_path(table), "r") as f:
+            meta = json.load(f)
+        rows = meta["rows"]
+        result = {}
+        for name in columns or meta["columns"]:
+            code = meta["columns"][name]
+            path = os.path.join(self.directory, table, name + ".bin")
+            if rows == 0:
+                result[name] = []
+                continue
+            if np is not None:
+                dtype = f"S{meta.get('id_width', ID_WIDTH)}" if code == "S" else code
+                result[name] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+                continue
+            with open(path, "rb") as f:
+                view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            if code == "S":
+                # Raw bytes, id_width per row, space padded.
+                result[name] = view[:rows * meta.get("id_width", ID_WIDTH)]
+            else:
+                result[name] = view.cast(code)[:rows]
+        return result
+
+    def dictionaries(self, table):
+        with open(self._meta_path(table), "r") as f:
+            return json.load(f)["dictionaries"]
+
+
+if __name__ == "__main__":
+    export = ColumnarExport(sys.argv[1] if len(sys.argv) > 1 else COLUMNAR_DIR)
+    print(f"Exported {export.export_ledger()} new ledger rows")
+    print(f"Exported {export.export_accounts()} accounts")
@@ -3,6 +3,7 @@ import os
 
 accounts_file = "accounts.csv"
 transactions_file = "transactions.csv"
+ledger_dir = "ledger"
 notifications_file = "notifications.csv"
 
 class FileSetup:
@@ -11,11 +12,14 @@ class FileSetup:
         if not os.path.exists(accounts_file):
             with open(accounts_file, "w", newline="") as f:
                 writer = csv.writer(f)
-                writer.writerow(["account_number", "name", "balance", "status"])
-                writer.writerow(["1001", "John", "10000", "active"])
-                writer.writerow(["1002", "Adi", "8000", "active"])
+                writer.writerow(["account_number", "name", "balance", "status", "account_type",
+                                 "interest_month"])
+                writer.writerow(["1001", "John", "10000", "active", "Savings", ""])
+                writer.writerow(["1002", "Adi", "8000", "active", "Savings", ""])
 
-        if not os.path.exists(transactions_file):
+        # Once the ledger directory exists it holds the transactions; the old
+        # file was imported and renamed, and must not come back empty.
+        if not os.path.exists(transactions_file) and not os.path.exists(ledger_dir):
             with open(transactions_file, "w", newline="") as f:
                 writer = csv.writer(f)
                 writer.writerow(["transaction_id", "account_number", "type", "amount", "date", "status"])
@@ -1,5 +1,190 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from ledger import ledger
+from money import to_cents, format_cents
+
+FRAUD_WINDOW_MINUTES = 10
+FRAUD_BUCKETS = 10
+FRAUD_MAX_ACCOUNTS = 100000
+
+# Amounts are integer cents, like every other balance and ledger amount.
+FRAUD_RULES = {
+    "high_value": 5000000,        # single transaction amount ($50,000)
+    "max_count": 10,              # transactions per account per window
+    "max_sum": 20000000,          # total amount per account per window
+    "structuring_threshold": 5000000,
+    "structuring_band": 0.1,      # amounts within 10% below the threshold
+    "structuring_count": 3,       # near-threshold transactions per window
+}
+
+# A bulk feed posts all of its rows at once, often many per account, so the
+# per-window velocity limits are scaled to a feed rather than to a person.
+BULK_FRAUD_RULES = {
+    "max_count": 1000,
+    "max_sum": 100000000,         # $1,000,000 per account per feed
+}
+
+# Ledger types that represent money initiated by the account holder.
+WATCHED_TYPES = ("DEPOSIT", "WITHDRAW", "TRANSFER_DEBIT")
+
+
+class AccountWindow:
+    __slots__ = ("epochs", "counts", "sums", "maxes", "nears",
+                 "last", "count", "total", "near")
+
+    def __init__(self, buckets):
+        self.epochs = [-1] * buckets
+        self.counts = [0] * buckets
+        self.sums = [0] * buckets
+        self.maxes = [0] * buckets
+        self.nears = [0] * buckets
+        self.last = -1
+        self.count = 0
+        self.total = 0
+        self.near = 0
+
+    def _clear(self, slot):
+        self.count -= self.counts[slot]
+        self.total -= self.sums[slot]
+        self.near -= self.nears[slot]
+        self.counts[slot] = 0
+        self.sums[slot] = 0
+        self.maxes[slot] = 0
+        self.nears[slot] = 0
+
+    def add(self, bucket, amount, near):
+        size = len(self.epochs)
+        if bucket <= self.last - size:
+            return False
+
+        # Expire at most one full ring of buckets, so the cost per event is
+        # bounded by the bucket count no matter how long the account slept.
+        if bucket > self.last:
+            start = max(self.last + 1, bucket - size + 1)
+            for b in range(start, bucket + 1):
+                slot = b % size
+                self._clear(slot)
+                self.epochs[slot] = b
+            self.last = bucket
+
+        slot = bucket % size
+        self.counts[slot] += 1
+        self.sums[slot] += amount
+        if amount > self.maxes[slot]:
+            self.maxes[slot] = amount
+        self.count += 1
+        self.total += amount
+        if near:
+            self.nears[slot] += 1
+            self.near += 1
+        return True
+
+    def max_amount(self):
+        low = self.last - len(self.epochs)
+        return max((m for e, m in zip(self.epochs, self.maxes) if e > low),
+                   default=0)
+
+
+class FraudEngine:
+    def __init__(self, rules=None, window_minutes=FRAUD_WINDOW_MINUTES,
+                 buckets=FRAUD_BUCKETS, max_accounts=FRAUD_MAX_ACCOUNTS):
+        self.rules = dict(FRAUD_RULES)
+        if rules:
+            self.rules.update(rules)
+        self.window_minutes = window_minutes
+        self.window_seconds = window_minutes * 60
+        self.buckets = buckets
+        self.bucket_seconds = self.window_seconds / buckets
+        self.max_accounts = max_accounts
+        self.accounts = OrderedDict()
+
+    def _window(self, acc_no):
+        w = self.accounts.get(acc_no)
+        if w is None:
+            w = AccountWindow(self.buckets)
+            self.accounts[acc_no] = w
+            if len(self.accounts) > self.max_accounts:
+                self.accounts.popitem(last=False)
+        else:
+            self.accounts.move_to_end(acc_no)
+        return w
+
+    def _is_near(self, amount):
+        threshold = self.rules["structuring_threshold"]
+        if not threshold:
+            return False
+        floor = threshold - int(threshold * self.rules["structuring_band"])
+        return floor <= amount < threshold
+
+    def observe(self, acc_no, amount, when=None):
+        if when is None:
+            when = time.time()
+        w = self._window(acc_no)
+        w.add(int(when // self.bucket_seconds), amount, self._is_near(amount))
+        return w
+
+    def check(self, acc_no, amount, when=None):
+        w = self.observe(acc_no, amount, when)
+        rules = self.rules
+        alerts = []
+
+        if rules["high_value"] and amount > rules["high_value"]:
+            alerts.append("High value transaction detected!")
+        if rules["max_count"] and w.count > rules["max_count"]:
+            alerts.append(f"{w.count} transactions in the last "
+                          f"{self.window_minutes} minutes")
+        if rules["max_sum"] and w.total > rules["max_sum"]:
+            alerts.append(f"{format_cents(w.total)} moved in the last "
+                          f"{self.window_minutes} minutes")
+        if rules["structuring_count"] and w.near >= rules["structuring_count"]:
+            alerts.append(f"{w.near} transactions just below "
+                          f"{format_cents(rules['structuring_threshold'])} "
+                          "(possible structuring)")
+        return alerts
+
+    def stats(self, acc_no):
+        w = self.accounts.get(acc_no)
+        if w is None:
+            return {"count": 0, "sum": 0, "max": 0}
+        return {"count": w.count, "sum": w.total, "max": w.max_amount()}
+
+    def warm(self, now=None):
+        if now is None:
+            now = time.time()
+        since = datetime.fromtimestamp(now - self.window_seconds)
+        replayed = 0
+        # Only the ledger segments that overlap the window are opened.
+        for row in ledger.rows(since=since.strftime("%Y-%m-%d %H:%M:%S")):
+            if row["type"] not in WATCHED_TYPES or row["status"] == "REVERSED":
+                continue
+            try:
+                when = datetime.strptime(row["date"], "%Y-%m-%d %H:%M:%S").timestamp()
+                amount = to_cents(row["amount"])
+            except ValueError:
+                continue
+            self.observe(row["account_number"], amount, when)
+            replayed += 1
+        return replayed
+
+
+engine = FraudEngine()
+bulk_engine = FraudEngine(BULK_FRAUD_RULES)
+
+
 class FraudDetection:
     @staticmethod
-    def check(amount):
-        if amount > 50000:
-            print("⚠ Warning: High value transaction detected!")
+    def check(amount, acc_no=None):
+        if acc_no is None:
+            alerts = []
+            if amount > engine.rules["high_value"]:
+                alerts.append("High value transaction detected!")
+        else:
+            alerts = engine.check(acc_no, amount)
+        for alert in alerts:
+            print(f"⚠ Warning: {alert}")
+        return alerts
+
+    @staticmethod
+    def warm():
+        return engine.warm()
@@ -1,12 +1,9 @@
-import csv
-from file_setup import transactions_file
+from engine import engine
 
 class TransactionHistory:
     @staticmethod
-    def view(acc_no):
-        with open(transactions_file, "r") as f:
-            reader = csv.DictReader(f)
-            print("\nTransaction History:")
-            for row in reader:
-                if row["account_number"] == acc_no:
-                    print(row)
+    def view(acc_no, since=None, until=None):
+        print("\nTransaction History:")
+        with engine.snapshot() as snap:
+            for row in snap.transactions(acc_no, since=since, until=until):
+                print(row)
@@ -0,0 +1,170 @@
+import dbm
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from storage import FileLock
+
+IDEMPOTENCY_FILE = "idempotency_keys"
+IDEMPOTENCY_CACHE_SIZE = 10000
+IDEMPOTENCY_TTL = 24 * 3600
+IDEMPOTENCY_LOCK_SLOTS = 4096
+
+
+class KeyLock:
+    """Exclusive lock on one key, across threads and processes.
+
+    A key hashes to one byte of a lock file, locked with lockf, and to the
+    thread lock of the same slot; only keys that hash alike wait for each
+    other. The file stays open: closing any descriptor of it would drop
+    the process's lockf locks.
+    """
+
+    def __init__(self, path, slots=IDEMPOTENCY_LOCK_SLOTS):
+        self.f = open(path + ".keylock", "a+")
+        self.slots = slots
+        self.threads = [threading.Lock() for _ in range(slots)]
+
+    def acquire(self, key):
+        slot = zlib.crc32(key.encode()) % self.slots
+        self.threads[slot].acquire()
+        fcntl.lockf(self.f, fcntl.LOCK_EX, 1, slot)
+        return slot
+
+    def release(self, slot):
+        fcntl.lockf(self.f, fcntl.LOCK_UN, 1, slot)
+        self.threads[slot].release()
+
+
+class IdempotencyStore:
+    """Results of applied operations, by the caller's idempotency key.
+
+    A retried request carrying the same key gets the original result back
+    instead of being applied again. Recent keys are answered from an LRU
+    cache without any file access; older ones, and keys seen by other
+    processes, from dbm files. Keys expire after ttl seconds: each file
+    holds the keys stored in one ttl-long period, and a file is deleted
+    whole once every key in it has expired.
+
+    Only results other than None and False are kept: a request that was
+    rejected changed nothing and may be retried.
+    """
+
+    def __init__(self, path=IDEMPOTENCY_FILE, capacity=IDEMPOTENCY_CACHE_SIZE,
+                 ttl=IDEMPOTENCY_TTL):
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self.cache = OrderedDict()  # key -> (expires, request, result)
+        self.lock = threading.Lock()
+        self.keys = None  # KeyLock, opened on first use
+        self.period = None  # newest period whose older files were deleted
+
+    def _cached(self, key, now):
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return entry
+
+    def _remember(self, key, entry):
+        with self.lock:
+            self.cache[key] = entry
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+
+    @staticmethod
+    def _replay(key, entry, request):
+        if entry[1] != request:
+            print(f"Idempotency key {key} was already used for a different request")
+            return None
+        return entry[2]
+
+    def _key_lock(self):
+        with self.lock:
+            if self.keys is None:
+                self.keys = KeyLock(self.path)
+            return self.keys
+
+    def run(self, key, request, operation):
+        """operation() once per key; its result again for repeats of the key
+
+        request describes the operation (type, accounts, amount) so a key
+        reused for something else is refused rather than replayed.
+        """
+        if key is None:
+            return operation()
+        request = json.loads(json.dumps(request))
+        entry = self._cached(key, time.time())
+        if entry is not None:
+            return self._replay(key, entry, request)
+
+        # Only this key is held across the operation, so a retry racing the
+        # original waits for it and then replays its result while other keys
+        # go ahead.
+        keys = self._key_lock()
+        slot = keys.acquire(key)
+        try:
+            now = time.time()
+            entry = self._load(key, now)
+            if entry is not None:
+                self._remember(key, entry)
+                return self._replay(key, entry, request)
+
+            result = operation()
+            if result is None or result is False:
+                return result
+            entry = (now + self.ttl, request, result)
+            self._store(key, entry, now)
+            self._remember(key, entry)
+            return result
+        finally:
+            keys.release(slot)
+
+    def _file(self, period):
+        return f"{self.path}.{period}"
+
+    def _load(self, key, now):
+        # A live key was stored in this period or the one before.
+        period = int(now // self.ttl)
+        with FileLock(self.path, shared=True):
+            for path in (self._file(period), self._file(period - 1)):
+                try:
+                    with dbm.open(path, "r") as db:
+                        raw = db.get(key)
+                except dbm.error:
+                    continue
+                if raw is not None:
+                    entry = tuple(json.loads(raw))
+                    return entry if entry[0] > now else None
+        return None
+
+    def _store(self, key, entry, now):
+        period = int(now // self.ttl)
+        with FileLock(self.path):
+            with dbm.open(self._file(period), "c") as db:
+                db[key] = json.dumps(entry)
+            if self.period != period:
+                self._expire(period)
+                self.period = period
+
+    def _expire(self, period):
+        # Caller holds FileLock(self.path). Files two periods old hold only
+        # expired keys.
+        prefix = self.path + "."
+        for path in glob.glob(glob.escape(prefix) + "*"):
+            stored = path[len(prefix):].split(".")[0]
+            if stored.isdigit() and int(stored) < period - 1:
+                os.remove(path)
+
+
+idempotency = IdempotencyStore()
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+# 16 character ids built from an 80 bit integer:
+#   42 bits  milliseconds since ID_EPOCH_MS
+#   22 bits  node (process id, or NIYATI_NODE_ID when set)
+#   16 bits  sequence within the millisecond
+# Encoded in fixed width Crockford base32, so string order is time order.
+
+ID_EPOCH_MS = 1577836800000  # 2020-01-01 00:00:00 UTC
+ID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_LENGTH = 16
+
+TIME_BITS = 42
+NODE_BITS = 22
+SEQ_BITS = 16
+
+NODE_MASK = (1 << NODE_BITS) - 1
+SEQ_MASK = (1 << SEQ_BITS) - 1
+
+_DECODE = {c: i for i, c in enumerate(ID_ALPHABET)}
+
+
+def encode(value):
+    chars = []
+    for _ in range(ID_LENGTH):
+        chars.append(ID_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def decode(id_str):
+    value = 0
+    for c in id_str.upper():
+        value = (value << 5) | _DECODE[c]
+    return value
+
+
+def _default_node():
+    node = os.environ.get("NIYATI_NODE_ID")
+    if node:
+        return int(node) & NODE_MASK
+    return os.getpid() & NODE_MASK
+
+
+class IdGenerator:
+    def __init__(self, node=None):
+        self.fixed_node = node
+        self.lock = threading.Lock()
+        self.pid = None
+        self.node = 0 if node is None else node & NODE_MASK
+        self.last_ms = -1
+        self.seq = 0
+
+    def next_id(self):
+        with self.lock:
+            # A forked child must not keep issuing ids under its parent's node.
+            if self.fixed_node is None and self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.node = _default_node()
+                self.last_ms = -1
+
+            now = int(time.time() * 1000) - ID_EPOCH_MS
+            if now <= self.last_ms:
+                # Same millisecond, or the clock stepped back: keep counting
+                # from the last issued millisecond so ids stay monotonic.
+                now = self.last_ms
+                self.seq = (self.seq + 1) & SEQ_MASK
+                if self.seq == 0:
+                    now += 1
+                    while int(time.time() * 1000) - ID_EPOCH_MS < now:
+                        time.sleep(0.0001)
+            else:
+                self.seq = 0
+            self.last_ms = now
+
+            value = (now << (NODE_BITS + SEQ_BITS)) | (self.node << SEQ_BITS) | self.seq
+            return encode(value)
+
+
+_generator = IdGenerator()
+
+
+def new_id():
+    return _generator.next_id()
+
+
+def id_timestamp(id_str):
+    """Unix time (seconds) at which an id was issued"""
+    return ((decode(id_str) >> (NODE_BITS + SEQ_BITS)) + ID_EPOCH_MS) / 1000
+
+
+def id_bounds(start=None, end=None):
+    """Smallest and largest possible ids for a unix time range (seconds)"""
+    low = "0" * ID_LENGTH
+    high = ID_ALPHABET[-1] * ID_LENGTH
+    if start is not None:
+        ms = max(int(start * 1000) - ID_EPOCH_MS, 0)
+        low = encode(ms << (NODE_BITS + SEQ_BITS))
+    if end is not None:
+        ms = max(int(end * 1000) - ID_EPOCH_MS, 0)
+        high = encode(((ms + 1) << (NODE_BITS + SEQ_BITS)) - 1)
+    return low, high
@@ -0,0 +1,276 @@
+import csv
+import os
+import struct
+from datetime import datetime, timedelta
+from file_setup import notifications_file
+
+INBOX_PAGE_SIZE = 20
+INBOX_KEEP = 1000  # newest notifications per account kept by compact()
+INBOX_RETENTION_DAYS = 90
+
+# Index entry: row offset and length in the notifications file, then the
+# number of the same account's previous entry (-1 for its first).
+ENTRY = struct.Struct("<qqq")
+HEADER_PREFIX = b"notification_id,"
+
+HEADS_MAGIC = b"INBOXH01"
+# Heads file header: magic, slot count, slots in use, inode of the
+# notifications file indexed, entries in the index file, bytes of the
+# notifications file indexed.
+HEADS_HEADER = struct.Struct("<8sQQQQQ")
+# Slot: account number (0 for a free slot), its newest index entry.
+HEAD = struct.Struct("<qq")
+HEADS_MIN_CAPACITY = 1024
+# A cursor is the index entry to read next under the notifications file's
+# inode, so cursors from before a compact() or rebuild are refused.
+CURSOR_ENTRY_BITS = 40
+
+
+def _key(acc_no):
+    try:
+        acc_no = int(acc_no)
+    except (TypeError, ValueError):
+        return None
+    return acc_no if acc_no > 0 else None
+
+
+class HeadsFile:
+    """Each account's newest index entry, in an open-addressed table on disk.
+
+    Slots are probed as in shm.BalanceTable, so finding or moving a head
+    reads or writes a slot or two however many accounts there are. The
+    table doubles once half full. The file stays open between calls and is
+    reopened only when another process replaced it. Callers hold the
+    notifications file lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.f = None
+        self.capacity = self.used = self.inode = self.entries = self.covered = 0
+
+    def load(self):
+        """Read the header; False if there is no usable heads file"""
+        try:
+            if self.f is None or os.stat(self.path).st_ino != os.fstat(self.f.fileno()).st_ino:
+                if self.f is not None:
+                    self.f.close()
+                self.f = open(self.path, "r+b")
+        except FileNotFoundError:
+            self.f = None
+            return False
+        header = os.pread(self.f.fileno(), HEADS_HEADER.size, 0)
+        if len(header) < HEADS_HEADER.size:
+            return False
+        magic, self.capacity, self.used, self.inode, self.entries, self.covered = \
+            HEADS_HEADER.unpack(header)
+        return magic == HEADS_MAGIC
+
+    def reset(self, inode, heads=(), capacity=HEADS_MIN_CAPACITY):
+        """Replace the file with a table of heads [(account, entry)] for a fresh index"""
+        while capacity < 2 * len(heads):
+            capacity <<= 1
+        slots = bytearray(capacity * HEAD.size)
+        for acc, entry in heads:
+            i = self._probe(acc, capacity, lambda i: slots[i * HEAD.size:(i + 1) * HEAD.size])[0]
+            HEAD.pack_into(slots, i * HEAD.size, acc, entry)
+        entries, covered = (self.entries, self.covered) if heads else (0, 0)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADS_HEADER.pack(HEADS_MAGIC, capacity, len(heads), inode, entries, covered))
+            f.write(slots)
+        os.replace(tmp, self.path)
+        self.load()
+
+    @staticmethod
+    def _probe(acc, capacity, read):
+        # (slot holding acc or the free slot where it would go, its entry or -1)
+        mask = capacity - 1
+        i = (acc * 0x9E3779B97F4A7C15 >> 17) & mask
+        while True:
+            found, entry = HEAD.unpack(read(i))
+            if found == acc:
+                return i, entry
+            if found == 0:
+                return i, -1
+            i = (i + 1) & mask
+
+    def _read_slot(self, i):
+        return os.pread(self.f.fileno(), HEAD.size, HEADS_HEADER.size + i * HEAD.size)
+
+    def get(self, acc):
+        return self._probe(acc, self.capacity, self._read_slot)[1]
+
+    def update(self, heads, entries, covered):
+        """Set heads {account: entry}, then the header's index counts"""
+        if 2 * (self.used + len(heads)) > self.capacity:
+            merged = dict(self.items())
+            merged.update(heads)
+            self.reset(self.inode, list(merged.items()), 2 * self.capacity)
+        fd = self.f.fileno()
+        for acc, entry in heads.items():
+            i, old = self._probe(acc, self.capacity, self._read_slot)
+            if old == -1:
+                self.used += 1
+            os.pwrite(fd, HEAD.pack(acc, entry), HEADS_HEADER.size + i * HEAD.size)
+        self.entries, self.covered = entries, covered
+        os.pwrite(fd, HEADS_HEADER.pack(HEADS_MAGIC, self.capacity, self.used, self.inode,
+                                        entries, covered), 0)
+
+    def items(self):
+        """(account, newest entry) of every account, in slot order"""
+        slots = os.pread(self.f.fileno(), self.capacity * HEAD.size, HEADS_HEADER.size)
+        for acc, entry in HEAD.iter_unpack(slots):
+            if acc:
+                yield acc, entry
+
+
+class InboxIndex:
+    """Per-account index over the append-only notifications file.
+
+    Every row gets a fixed-width entry pointing back to the previous entry of
+    the same account, and a HeadsFile keeps each account's newest entry, so a
+    page of an inbox is read by following page_size back-pointers. Rows the
+    writer did not index itself (older files, other writers) are indexed on
+    the next access; an index that does not match its file is rebuilt.
+    Callers hold the notifications file lock.
+    """
+
+    def __init__(self, path=notifications_file):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.heads = HeadsFile(path + ".heads")
+
+    def _open(self, catch_up=True):
+        heads = self.heads
+        inode = os.stat(self.path).st_ino
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        if (not heads.load() or heads.inode != inode
+                or index_size < heads.entries * ENTRY.size):
+            heads.reset(inode)
+        if catch_up:
+            self._catch_up()
+
+    def _catch_up(self):
+        covered = self.heads.covered
+        if os.path.getsize(self.path) <= covered:
+            return
+        entries = []
+        with open(self.path, "rb") as f:
+            f.seek(covered)
+            offset = start = covered
+            pending = b""
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # row still being written
+                if not pending:
+                    start = offset
+                pending += line
+                offset += len(line)
+                if pending.count(b'"') % 2:
+                    continue  # newline inside a quoted field
+                if pending.strip() and not pending.startswith(HEADER_PREFIX):
+                    row = next(csv.reader([pending.decode()]))
+                    entries.append((start, len(pending), row[1]))
+                pending = b""
+                covered = offset
+        self._add(entries, covered)
+
+    def _add(self, entries, covered):
+        count = self.heads.entries
+        heads = {}
+        with open(self.index_path, "ab") as f:
+            # Entries past the count are from a batch that never committed.
+            f.truncate(count * ENTRY.size)
+            for offset, length, acc in entries:
+                acc = _key(acc)
+                if acc is None:
+                    continue  # no inbox to read it from
+                prev = heads.get(acc)
+                if prev is None:
+                    prev = self.heads.get(acc)
+                f.write(ENTRY.pack(offset, length, prev))
+                heads[acc] = count
+                count += 1
+        self.heads.update(heads, count, covered)
+
+    def record(self, entries):
+        """Index rows just appended: [(offset, length, account number)]"""
+        if not entries:
+            return
+        self._open(catch_up=False)
+        if self.heads.covered == entries[0][0]:
+            self._add(entries, entries[-1][0] + entries[-1][1])
+        else:
+            self._catch_up()
+
+    def read(self, acc_no, limit=INBOX_PAGE_SIZE, before=None):
+        """(notifications newest first, cursor for the next page or None)
+
+        before is the cursor returned with the previous page.
+        """
+        if not os.path.exists(self.path):
+            return [], None
+        self._open()
+        acc = _key(acc_no)
+        if acc is None:
+            return [], None
+        if before is None:
+            entry = self.heads.get(acc)
+        else:
+            entry = before & ((1 << CURSOR_ENTRY_BITS) - 1)
+            if before >> CURSOR_ENTRY_BITS != self.heads.inode or entry >= self.heads.entries:
+                print("Invalid or expired cursor")
+                return [], None
+
+        rows = []
+        with open(self.index_path, "rb") as index, open(self.path, "rb") as f:
+            while entry != -1 and len(rows) < limit:
+                index.seek(entry * ENTRY.size)
+                offset, length, entry = ENTRY.unpack(index.read(ENTRY.size))
+                f.seek(offset)
+                row = next(csv.reader([f.read(length).decode()]))
+                if _key(row[1]) != acc:
+                    # Entries only chain rows of one account, so this is a
+                    # cursor of another account.
+                    print("Invalid or expired cursor")
+                    return [], None
+                rows.append(dict(zip(["notification_id", "account_number", "message", "date"], row)))
+        if entry == -1:
+            return rows, None
+        return rows, self.heads.inode << CURSOR_ENTRY_BITS | entry
+
+    def compact(self, keep=INBOX_KEEP, days=INBOX_RETENTION_DAYS):
+        """Drop notifications older than days and all but keep per account"""
+        cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+        self._open()
+        total = self.heads.entries
+        heads = [entry for _, entry in self.heads.items()]
+
+        kept = []
+        with open(self.index_path, "rb") as index, open(self.path, "rb") as f:
+            header = f.readline()
+            for entry in heads:
+                for _ in range(keep):
+                    if entry == -1:
+                        break
+                    index.seek(entry * ENTRY.size)
+                    offset, length, entry = ENTRY.unpack(index.read(ENTRY.size))
+                    f.seek(offset)
+                    line = f.read(length)
+                    if next(csv.reader([line.decode()]))[3] < cutoff:
+                        break
+                    kept.append((offset, line))
+
+        kept.sort()
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(header)
+            for _, line in kept:
+                out.write(line)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, self.path)
+        self._open()
+        return total - len(kept)
+
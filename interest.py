@@ -0,0 +1,172 @@
+import json
+import os
+import sys
+from bisect import bisect_right
+from datetime import datetime
+from engine import engine
+from idgen import new_id
+from money import format_cents
+
+INTEREST_CHUNK = 100000
+INTEREST_CHECKPOINT = "interest_checkpoint.json"
+
+
+def months_between(since, month):
+    """Whole months after YYYY-MM `since` up to and including `month`"""
+    if not since:
+        return 1
+    y, m = map(int, since.split("-"))
+    year, mon = map(int, month.split("-"))
+    return (year * 12 + mon) - (y * 12 + m)
+
+
+def compound_interest(balance, annual_rate, months):
+    # Closed form of `months` monthly compoundings at annual_rate / 12.
+    return balance * ((1 + annual_rate / 12) ** months - 1)
+
+
+class InterestJob:
+    """Posts month-end interest to every account of a Project.Bank.
+
+    Accounts are handled in account-number order, chunk_size at a time.
+    Each chunk's credits and ledger rows are written to the checkpoint
+    before they are committed, so a rerun after a crash finishes that chunk
+    from the checkpoint and carries on after it. Credits are added to the
+    stored balances together with the month they are for, in one table
+    write, and an account already marked with the month is skipped: nothing
+    is posted twice, and missed months are caught up in one compounded
+    posting.
+    """
+
+    def __init__(self, bank, month=None, chunk_size=INTEREST_CHUNK,
+                 checkpoint=INTEREST_CHECKPOINT, engine=engine):
+        self.bank = bank
+        self.month = month or datetime.now().strftime("%Y-%m")
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.engine = engine
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint, "r") as f:
+                state = json.load(f)
+            if state["month"] == self.month:
+                return state
+            # An unfinished chunk of an earlier month still has to land.
+            return {"month": self.month, "last_account": None, "pending": state["pending"]}
+        return {"month": self.month, "last_account": None, "pending": None}
+
+    def save_checkpoint(self, state):
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint)
+
+    def _commit(self, pending, recovering=False):
+        ok, changed = self.engine.post(pending["credits"], "interest_month", pending["month"])
+        if not ok:
+            print(f"Interest not posted: {changed}")
+            return None
+
+        rows = pending["ledger"]
+        if recovering and rows:
+            # The ledger may already hold some of the chunk's rows; ids are
+            # increasing, so the chunk's id range bounds the lookup.
+            present = {row["transaction_id"]
+                       for row in self.engine.ledger.rows(id_from=rows[0][0], id_to=rows[-1][0])}
+            rows = [row for row in rows if row[0] not in present]
+        elif rows:
+            # Accounts someone else credited for the month meanwhile get no row.
+            rows = [row for row in rows if row[1] in changed]
+        self.engine.log(rows)
+        self.engine.flush()
+
+        for acc_no, balance in changed.items():
+            account = self.bank.accounts.get(int(acc_no))
+            if account is None:
+                continue
+            account.interest_month = pending["month"]
+            amount = pending["credits"][acc_no]
+            if amount:
+                account.post_interest(amount, balance, pending["timestamp"])
+                account.saved_transactions = len(account.transactions)
+            else:
+                account.balance = balance
+                account.notify_change(balance)
+        return changed
+
+    def run(self):
+        if self.engine.balances is not None:
+            print("Interest is not posted while a shared balance table is served")
+            return 0, 0
+        state = self.load_checkpoint()
+        pending = state["pending"]
+        if pending:
+            if self._commit(pending, recovering=True) is None:
+                return 0, 0
+            if pending["month"] == self.month:
+                state["last_account"] = pending["last_account"]
+            state["pending"] = None
+            self.save_checkpoint(state)
+
+        # Interest rows are logged from the checkpoint, so anything the bank
+        # has not saved yet goes first.
+        self.engine.log(self.bank.transaction_rows(self.bank.accounts.values()))
+
+        numbers = sorted(self.bank.accounts)
+        start = 0 if state["last_account"] is None else bisect_right(numbers, state["last_account"])
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        posted = 0
+        total = 0
+
+        for i in range(start, len(numbers), self.chunk_size):
+            chunk = [self.bank.accounts[n] for n in numbers[i:i + self.chunk_size]]
+            credits = {}
+            ledger = []
+            for account in chunk:
+                months = months_between(account.interest_month, self.month)
+                if months <= 0 or not account.is_active:
+                    continue
+                interest = 0
+                rate = getattr(account, "interest_rate", 0)
+                if rate and account.balance > 0:
+                    interest = round(compound_interest(account.balance, rate, months))
+                acc_no = str(account.account_number)
+                credits[acc_no] = interest
+                if interest:
+                    ledger.append([new_id(), acc_no, "DEPOSIT", format_cents(interest),
+                                   timestamp, "SUCCESS"])
+
+            state["pending"] = {
+                "month": self.month,
+                "last_account": chunk[-1].account_number,
+                "timestamp": timestamp,
+                "credits": credits,
+                "ledger": ledger
+            }
+            self.save_checkpoint(state)
+            changed = self._commit(state["pending"])
+            if changed is None:
+                return posted, total
+            posted += sum(1 for row in ledger if row[1] in changed)
+            total += sum(credits[acc_no] for acc_no in changed)
+            state["last_account"] = chunk[-1].account_number
+            state["pending"] = None
+            self.save_checkpoint(state)
+
+        print(f"Interest for {self.month}: ${format_cents(total)} posted to {posted} accounts")
+        return posted, total
+
+
+if __name__ == "__main__":
+    from Project import Bank
+
+    month = sys.argv[1] if len(sys.argv) > 1 else None
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else INTEREST_CHUNK
+    import shm
+    shm.attach()
+    bank = Bank("National Bank")
+    bank.load_accounts()
+    InterestJob(bank, month, chunk_size).run()
@@ -0,0 +1,381 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime, timedelta
+from archive import Archive, CODECS, ARCHIVE_CODEC, compress_csv
+from file_setup import transactions_file, ledger_dir
+from scan import scan_file
+from storage import FileLock
+
+LEDGER_DIR = ledger_dir
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+
+TRANSACTION_FIELDS = ["transaction_id", "account_number", "type", "amount", "date", "status"]
+REVERSAL_FIELDS = ["transaction_id", "date"]
+
+# Project.Bank's old transactions file: its types and statuses in ledger terms.
+PROJECT_TYPES = {"Deposit": "DEPOSIT", "Withdrawal": "WITHDRAW", "Transfer": "TRANSFER_CREDIT",
+                 "Transfer Out": "TRANSFER_DEBIT", "Fee": "FEE"}
+PROJECT_STATUSES = {"Completed": "SUCCESS"}
+
+
+def normalize_transaction(row):
+    """A transactions row in any older layout, as a list in TRANSACTION_FIELDS order"""
+    if "transaction_id" in row:
+        return [row[k] for k in TRANSACTION_FIELDS]
+    # Project.Bank numbered transactions per account, so the account goes
+    # into the id to keep it unique.
+    return [f"P{row['AccountNumber']}-{row['TransactionID']}", row["AccountNumber"],
+            PROJECT_TYPES.get(row["Type"], row["Type"]), row["Amount"], row["Timestamp"],
+            PROJECT_STATUSES.get(row["Status"], row["Status"])]
+
+
+class Ledger:
+    """Append-only transaction ledger split into segment files.
+
+    Each segment holds one day of rows, capped at SEGMENT_MAX_BYTES. The
+    manifest lists every segment with its date range, id range and row
+    count; only the newest segment is open for appends, the rest never
+    change. Reversals are recorded in a separate overlay file so sealed
+    segments stay immutable.
+    """
+
+    def __init__(self, directory=LEDGER_DIR, max_bytes=SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.reversals_path = os.path.join(directory, "reversals.csv")
+        self._manifest = None
+        self._manifest_mtime = None
+        self._reversed = None
+        self._reversed_mtime = None
+        self._archives = {}
+
+    # manifest
+
+    def _init(self):
+        if os.path.exists(self.manifest_path):
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with FileLock(self.manifest_path):
+            if os.path.exists(self.manifest_path):
+                return
+            manifest = {"segments": []}
+            imported = self._import_legacy(manifest, transactions_file)
+            self._save_manifest(manifest)
+            if imported:
+                os.replace(transactions_file, transactions_file + ".imported")
+
+    def manifest(self):
+        self._init()
+        mtime = os.stat(self.manifest_path).st_mtime_ns
+        if mtime != self._manifest_mtime:
+            with open(self.manifest_path, "r") as f:
+                self._manifest = json.load(f)
+            self._manifest_mtime = mtime
+        return self._manifest
+
+    def _save_manifest(self, manifest):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+
+    def path(self, segment):
+        return os.path.join(self.directory, segment["file"])
+
+    # writes
+
+    def _seal(self, segment):
+        stats = {"rows": 0, "start": None, "end": None, "min_id": None, "max_id": None}
+        for row in self._read_segment(segment):
+            stats["rows"] += 1
+            date, tid = row["date"], row["transaction_id"]
+            if stats["start"] is None or date < stats["start"]:
+                stats["start"] = date
+            if stats["end"] is None or date > stats["end"]:
+                stats["end"] = date
+            if stats["min_id"] is None or tid < stats["min_id"]:
+                stats["min_id"] = tid
+            if stats["max_id"] is None or tid > stats["max_id"]:
+                stats["max_id"] = tid
+        segment.update(stats)
+        segment["sealed"] = True
+
+    def _open_segment(self, manifest, day):
+        prefix = "transactions-" + day.replace("-", "")
+        seq = sum(1 for s in manifest["segments"] if s["file"].startswith(prefix))
+        segment = {"file": f"{prefix}-{seq:03d}.csv", "day": day, "sealed": False,
+                   "rows": None, "start": None, "end": None,
+                   "min_id": None, "max_id": None}
+        with open(self.path(segment), "w", newline="") as f:
+            csv.writer(f).writerow(TRANSACTION_FIELDS)
+        manifest["segments"].append(segment)
+        return segment
+
+    def append(self, rows):
+        """Append rows (lists in TRANSACTION_FIELDS order) to the ledger"""
+        if not rows:
+            return
+        self._init()
+        with FileLock(self.manifest_path):
+            manifest = self.manifest()
+            changed = False
+            pending = []
+            active = None
+            if manifest["segments"] and not manifest["segments"][-1]["sealed"]:
+                active = manifest["segments"][-1]
+            size = os.path.getsize(self.path(active)) if active else 0
+
+            for row in rows:
+                day = row[4][:10]
+                if active is None or active["day"] != day or size >= self.max_bytes:
+                    if pending:
+                        self._write(active, pending)
+                        pending = []
+                    if active is not None:
+                        self._seal(active)
+                    active = self._open_segment(manifest, day)
+                    size = os.path.getsize(self.path(active))
+                    changed = True
+                pending.append(row)
+                size += sum(len(str(v)) for v in row) + len(row) + 1
+
+            self._write(active, pending)
+            if changed:
+                self._save_manifest(manifest)
+
+    def _write(self, segment, rows):
+        with open(self.path(segment), "a", newline="") as f:
+            csv.writer(f).writerows(rows)
+
+    def seal_active(self):
+        with FileLock(self.manifest_path):
+            manifest = self.manifest()
+            if manifest["segments"] and not manifest["segments"][-1]["sealed"]:
+                self._seal(manifest["segments"][-1])
+                self._save_manifest(manifest)
+
+    def _import_legacy(self, manifest, path):
+        # One-time move of the single-file ledger into segments.
+        if not os.path.exists(path):
+            return False
+        with open(path, "r", newline="") as f:
+            rows = [normalize_transaction(row) for row in csv.DictReader(f)]
+        if not rows:
+            return False
+        rows.sort(key=lambda r: r[4])
+        active, pending, size = None, [], 0
+        for row in rows:
+            day = row[4][:10]
+            if active is None or active["day"] != day or size >= self.max_bytes:
+                if active is not None:
+                    self._write(active, pending)
+                    self._seal(active)
+                active, pending, size = self._open_segment(manifest, day), [], 0
+            pending.append(row)
+            size += sum(len(str(v)) for v in row) + len(row) + 1
+        self._write(active, pending)
+        return True
+
+    def archive(self, older_than_days=30, codec=ARCHIVE_CODEC):
+        """Compress sealed segments whose rows are all older than the cutoff"""
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+        for segment in list(self.manifest()["segments"]):
+            if not segment["sealed"] or segment.get("archive") or not segment["rows"]:
+                continue
+            if segment["end"] >= cutoff:
+                continue
+            name = segment["file"] + CODECS[codec][2]
+            index = compress_csv(self.path(segment), os.path.join(self.directory, name),
+                                 codec, id_field="transaction_id")
+            with FileLock(self.manifest_path):
+                manifest = self.manifest()
+                for current in manifest["segments"]:
+                    if current["file"] == segment["file"]:
+                        current["archive"] = name
+                        current["source_bytes"] = index["source_bytes"]
+                        current["archive_bytes"] = index["archive_bytes"]
+                        archived = current
+                self._save_manifest(manifest)
+            os.remove(self.path(segment))
+            yield archived
+
+    # reads
+
+    def segments(self, since=None, until=None, id_from=None, id_to=None):
+        """Segments that may hold rows in the given date / id range"""
+        return select_segments(self.manifest()["segments"], since, until, id_from, id_to)
+
+    def _read_segment(self, segment, since=None, until=None, id_from=None, id_to=None,
+                      match=None, end=None):
+        # end: read only the first end bytes of a plain segment file.
+        if segment.get("archive"):
+            archive = self._archives.get(segment["archive"])
+            if archive is None:
+                archive = Archive(os.path.join(self.directory, segment["archive"]))
+                self._archives[segment["archive"]] = archive
+            yield from archive.rows(since, until, id_from, id_to, match)
+            return
+        path = self.path(segment)
+        if not os.path.exists(path):
+            # Archived since our copy of the manifest was loaded.
+            for current in self.manifest()["segments"]:
+                if current["file"] == segment["file"] and current.get("archive"):
+                    yield from self._read_segment(current, since, until, id_from, id_to, match)
+                    return
+        if match:
+            yield from scan_file(path, *match, end=end)
+            return
+        if end is None:
+            with open(path, "r", newline="") as f:
+                yield from csv.DictReader(f)
+            return
+        with open(path, "rb") as f:
+            data = f.read(end).decode()
+        yield from csv.DictReader(io.StringIO(data, newline=""))
+
+    def segment_rows(self, segment):
+        """Every row of one segment, without the reversal overlay"""
+        return self._read_segment(segment)
+
+    def reversed_ids(self):
+        if not os.path.exists(self.reversals_path):
+            return set()
+        mtime = os.stat(self.reversals_path).st_mtime_ns
+        if mtime != self._reversed_mtime:
+            with open(self.reversals_path, "r", newline="") as f:
+                self._reversed = {row["transaction_id"] for row in csv.DictReader(f)}
+            self._reversed_mtime = mtime
+        return self._reversed
+
+    def rows(self, acc_no=None, since=None, until=None, id_from=None, id_to=None,
+             t_type=None):
+        return self._rows(self.segments(since, until, id_from, id_to), self.reversed_ids(),
+                          acc_no, since, until, id_from, id_to, t_type)
+
+    def _rows(self, segments, reversed_ids, acc_no=None, since=None, until=None,
+              id_from=None, id_to=None, t_type=None, ends=None):
+        # The most selective equality filter is pushed down to a byte scan.
+        match = None
+        if id_from is not None and id_from == id_to:
+            match = ("transaction_id", id_from)
+        elif acc_no is not None:
+            match = ("account_number", acc_no)
+        elif t_type is not None:
+            match = ("type", t_type)
+
+        for segment in segments:
+            end = ends.get(segment["file"]) if ends else None
+            for row in self._read_segment(segment, since, until, id_from, id_to, match, end):
+                if t_type is not None and row["type"] != t_type:
+                    continue
+                if acc_no is not None and row["account_number"] != acc_no:
+                    continue
+                if since is not None and row["date"] < since:
+                    continue
+                if until is not None and row["date"] > until:
+                    continue
+                if id_from is not None and row["transaction_id"] < id_from:
+                    continue
+                if id_to is not None and row["transaction_id"] > id_to:
+                    continue
+                if row["transaction_id"] in reversed_ids:
+                    row["status"] = "REVERSED"
+                yield row
+
+    def find(self, transaction_id):
+        for row in self.rows(id_from=transaction_id, id_to=transaction_id):
+            return row
+        return None
+
+    def snapshot(self):
+        """Read-only view of the ledger as it is now"""
+        return LedgerSnapshot(self)
+
+    def reverse(self, transaction_id, date):
+        """Mark a transaction REVERSED; returns False if it does not exist"""
+        self._init()
+        with FileLock(self.reversals_path):
+            row = self.find(transaction_id)
+            if row is None or row["status"] == "REVERSED":
+                return row is not None
+            new = not os.path.exists(self.reversals_path)
+            with open(self.reversals_path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new:
+                    writer.writerow(REVERSAL_FIELDS)
+                writer.writerow([transaction_id, date])
+            return True
+
+
+def select_segments(segments, since=None, until=None, id_from=None, id_to=None):
+    for segment in segments:
+        if not segment["sealed"]:
+            if until is None or segment["day"] <= until[:10]:
+                yield segment
+            continue
+        if not segment["rows"]:
+            continue
+        if since is not None and segment["end"] < since:
+            continue
+        if until is not None and segment["start"] > until:
+            continue
+        if id_from is not None and segment["max_id"] < id_from:
+            continue
+        if id_to is not None and segment["min_id"] > id_to:
+            continue
+        yield segment
+
+
+class LedgerSnapshot:
+    """The ledger as of one moment, for reads that must not see later writes.
+
+    Taking a snapshot copies the manifest and notes how long the open
+    segment and the reversal overlay were; sealed segments never change, so
+    nothing else is copied. Reads stop at the noted lengths, so appends and
+    reversals made afterwards are invisible and never block the reader.
+    """
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        ledger._init()
+        with FileLock(ledger.manifest_path):
+            segments = ledger.manifest()["segments"]
+            self.segments_list = [dict(segment) for segment in segments]
+            self.ends = {segment["file"]: os.path.getsize(ledger.path(segment))
+                         for segment in self.segments_list if not segment["sealed"]}
+        self.reversals_end = (os.path.getsize(ledger.reversals_path)
+                              if os.path.exists(ledger.reversals_path) else 0)
+        self._reversed = None
+
+    def segments(self, since=None, until=None, id_from=None, id_to=None):
+        return select_segments(self.segments_list, since, until, id_from, id_to)
+
+    def reversed_ids(self):
+        if self._reversed is None:
+            self._reversed = set()
+            if self.reversals_end:
+                with open(self.ledger.reversals_path, "rb") as f:
+                    data = f.read(self.reversals_end).decode()
+                # A line still being written has no newline yet.
+                lines = data.split("\n")[1:-1]
+                self._reversed = {line.split(",", 1)[0] for line in lines}
+        return self._reversed
+
+    def rows(self, acc_no=None, since=None, until=None, id_from=None, id_to=None,
+             t_type=None):
+        return self.ledger._rows(self.segments(since, until, id_from, id_to),
+                                 self.reversed_ids(), acc_no, since, until, id_from, id_to,
+                                 t_type, self.ends)
+
+    def find(self, transaction_id):
+        for row in self.rows(id_from=transaction_id, id_to=transaction_id):
+            return row
+        return None
+
+
+ledger = Ledger()
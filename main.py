@@ -1,16 +1,13 @@
-from file_setup import FileSetup
-from deposit import Deposit
-from withdrawal import Withdrawal
-from transfer import FundTransfer
-from history import TransactionHistory
-from reversal import TransactionReversal
-from report import TransactionReport
+import sys
+
 
 class BankingSystem:
 
     @staticmethod
     def run():
-        FileSetup.create_files()
+        # Subsystems are imported by the commands that use them.
+        from cli import setup, run
+        setup()
 
         while True:
             print("\n===== ABC BANKING SYSTEM =====")
@@ -21,43 +18,62 @@ class BankingSystem:
             print("5 Reverse Transaction")
             print("6 Report")
             print("7 Exit")
+            print("8 Notifications")
 
             ch = input("Enter choice: ")
 
             if ch == "1":
                 acc = input("Account No: ")
-                amt = float(input("Amount: "))
-                Deposit(acc, amt, "DEPOSIT").process()
+                amt = input("Amount: ")
+                run(["deposit", acc, amt])
 
             elif ch == "2":
                 acc = input("Account No: ")
-                amt = float(input("Amount: "))
-                Withdrawal(acc, amt, "WITHDRAW").process()
+                amt = input("Amount: ")
+                run(["withdraw", acc, amt])
 
             elif ch == "3":
                 s = input("Sender: ")
                 r = input("Receiver: ")
-                amt = float(input("Amount: "))
-                FundTransfer.transfer(s, r, amt)
+                amt = input("Amount: ")
+                run(["transfer", s, r, amt])
 
             elif ch == "4":
                 acc = input("Account No: ")
-                TransactionHistory.view(acc)
+                run(["history", acc])
 
             elif ch == "5":
                 tid = input("Transaction ID: ")
-                TransactionReversal.reverse(tid)
+                run(["reverse", tid])
 
             elif ch == "6":
-                TransactionReport.generate()
+                run(["report"])
 
             elif ch == "7":
                 print("Exiting...")
                 break
 
+            elif ch == "8":
+                from notification import Notification
+                acc = input("Account No: ")
+                Notification.view(acc)
+
             else:
                 print("Invalid choice")
 
 
 if __name__ == "__main__":
-    BankingSystem.run()
+    # python main.py              interactive menu
+    # python main.py serve        keep a warm process answering on bank.sock
+    # python main.py CMD ARGS...  one command, on the server if one is running
+    if len(sys.argv) == 1:
+        BankingSystem.run()
+    else:
+        import cli
+        if sys.argv[1] == "serve":
+            cli.serve()
+        else:
+            status = cli.send(sys.argv[1:])
+            if status is None:
+                status = cli.run(sys.argv[1:])
+            sys.exit(status)
@@ -0,0 +1,42 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENTS = 100
+_CENT = Decimal("0.01")
+
+
+def to_cents(value):
+    """Integer cents of a dollar amount given as text or a number.
+
+    Text is parsed exactly, so "0.10" is 10 and never 9.999...; anything
+    finer than a cent (old float reprs such as "4102.029999999999") is
+    rounded half up. Raises ValueError for anything that is not an amount.
+    """
+    if isinstance(value, int):
+        return value * CENTS
+    if isinstance(value, float):
+        value = repr(value)
+    elif isinstance(value, Decimal):
+        value = str(value)
+    elif not isinstance(value, str):
+        raise ValueError(f"invalid amount: {value!r}")
+    text = value.strip()
+    whole, _, frac = text.partition(".")
+    digits = whole[1:] if whole[:1] in "+-" else whole
+    if digits.isdigit() and len(frac) <= 2 and (not frac or frac.isdigit()):
+        # Plain "123", "-123.4", "123.45": no Decimal needed.
+        cents = int(digits) * CENTS + (int(frac.ljust(2, "0")) if frac else 0)
+        return -cents if whole.startswith("-") else cents
+    try:
+        amount = Decimal(text).quantize(_CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"invalid amount: {value!r}")
+    return int(amount * CENTS)
+
+
+def format_cents(cents):
+    """Cents as a dollar amount with exactly two decimals, e.g. "-12.05" """
+    sign = "-" if cents < 0 else ""
+    whole, frac = divmod(abs(cents), CENTS)
+    return f"{sign}{whole}.{frac:02d}"
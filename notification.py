@@ -1,15 +1,181 @@
+import atexit
 import csv
-import uuid
+import io
+import queue
+import threading
+import time
 from datetime import datetime
 from file_setup import notifications_file
+from idgen import new_id
+from inbox import InboxIndex, INBOX_PAGE_SIZE, INBOX_KEEP, INBOX_RETENTION_DAYS
+from storage import FileLock
+
+NOTIFY_QUEUE_SIZE = 10000
+NOTIFY_BATCH_SIZE = 500
+NOTIFY_FLUSH_INTERVAL = 1.0
+NOTIFY_PUT_TIMEOUT = 5.0
+NOTIFY_CLOSE_RETRIES = 3  # attempts at a failing batch once the writer is closing
+
+
+class NotificationWriter:
+    def __init__(self, path=notifications_file, max_queue=NOTIFY_QUEUE_SIZE,
+                 batch_size=NOTIFY_BATCH_SIZE, flush_interval=NOTIFY_FLUSH_INTERVAL):
+        self.path = path
+        self.index = InboxIndex(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+        self.lock = threading.Lock()  # orders put() against close()
+        self.thread = threading.Thread(target=self._run,
+                                       name="notification-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, row, timeout=NOTIFY_PUT_TIMEOUT):
+        # Blocks while the queue is full so producers slow down to the
+        # writer's pace instead of growing memory without bound. Rows are
+        # only queued ahead of the close sentinel, never behind it.
+        with self.lock:
+            if not self.closed:
+                try:
+                    self.queue.put(row, timeout=timeout)
+                    return
+                except queue.Full:
+                    print("Notification queue full, writing synchronously")
+        self.write_rows([row])
+
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.put(None)
+        self.thread.join()
+
+    def write_rows(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        lines = []
+        for row in rows:
+            writer.writerow(row)
+            lines.append(buffer.getvalue().encode())
+            buffer.seek(0)
+            buffer.truncate()
+
+        with FileLock(self.path):
+            with open(self.path, "ab") as f:
+                offset = f.seek(0, 2)
+                f.write(b"".join(lines))
+            entries = []
+            for row, line in zip(rows, lines):
+                entries.append((offset, len(line), row[1]))
+                offset += len(line)
+            self.index.record(entries)
+
+    def _collect(self, batch):
+        # Adds queued rows to batch until it is full or flush_interval has
+        # passed; True once the close sentinel has been taken. Only waits
+        # for a first row when there is nothing left to retry.
+        if not batch:
+            row = self.queue.get()
+            if row is None:
+                return True
+            batch.append(row)
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is None:
+                return True
+            batch.append(row)
+        return False
+
+    def _run(self):
+        batch = []  # rows taken off the queue and not written yet
+        stop = False
+        failures = 0
+        while True:
+            if not stop:
+                stop = self._collect(batch)
+            if batch:
+                try:
+                    self.write_rows(batch)
+                except OSError as e:
+                    failures += 1
+                    if not stop or failures < NOTIFY_CLOSE_RETRIES:
+                        # Kept for the next attempt, with whatever arrives meanwhile.
+                        print(f"Error writing notifications, retrying: {e}")
+                        time.sleep(self.flush_interval)
+                        continue
+                    print(f"Error writing notifications, {len(batch)} lost: {e}")
+                for _ in batch:
+                    self.queue.task_done()
+                batch = []
+                failures = 0
+            if stop:
+                self.queue.task_done()
+                return
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = NotificationWriter()
+                atexit.register(_writer.close)
+    return _writer
+
 
 class Notification:
     @staticmethod
     def send(acc_no, message):
-        with open(notifications_file, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([str(uuid.uuid4())[:8],
-                             acc_no,
-                             message,
-                             datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+        get_writer().put([new_id(),
+                          acc_no,
+                          message,
+                          datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
         print("Notification:", message)
+
+    @staticmethod
+    def flush():
+        get_writer().flush()
+
+    @staticmethod
+    def inbox(acc_no, limit=INBOX_PAGE_SIZE, before=None):
+        """(notifications newest first, cursor for the next page or None)"""
+        writer = get_writer()
+        writer.flush()
+        with FileLock(writer.path):
+            return writer.index.read(acc_no, limit, before)
+
+    @staticmethod
+    def view(acc_no):
+        print("\nNotifications:")
+        before = None
+        while True:
+            rows, before = Notification.inbox(acc_no, before=before)
+            for row in rows:
+                print(f"{row['date']}  {row['message']}")
+            if before is None or input("Show more? (y/n): ").strip().lower() != "y":
+                return
+
+    @staticmethod
+    def compact(keep=INBOX_KEEP, days=INBOX_RETENTION_DAYS):
+        writer = get_writer()
+        writer.flush()
+        with FileLock(writer.path):
+            removed = writer.index.compact(keep, days)
+        print(f"Removed {removed} old notifications")
+        return removed
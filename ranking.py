@@ -0,0 +1,160 @@
+import threading
+from bisect import bisect_left, insort
+from itertools import chain, islice
+
+BUCKET_SIZE = 1000
+
+
+class SortedList:
+    """Sorted list of unique keys kept in buckets of about BUCKET_SIZE.
+
+    Adding or removing a key bisects the bucket maxima and then one bucket,
+    so only that bucket shifts in memory, however many keys there are.
+    """
+
+    def __init__(self):
+        self.buckets = []
+        self.maxes = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key):
+        if not self.buckets:
+            self.buckets.append([key])
+            self.maxes.append(key)
+        else:
+            i = min(bisect_left(self.maxes, key), len(self.maxes) - 1)
+            bucket = self.buckets[i]
+            insort(bucket, key)
+            self.maxes[i] = bucket[-1]
+            if len(bucket) > 2 * BUCKET_SIZE:
+                self.buckets[i:i + 1] = [bucket[:BUCKET_SIZE], bucket[BUCKET_SIZE:]]
+                self.maxes[i:i + 1] = [bucket[BUCKET_SIZE - 1], bucket[-1]]
+        self.size += 1
+
+    def update(self, keys):
+        """Add many keys with one sort instead of one insort each"""
+        keys = sorted(chain(self, keys))
+        self.buckets = [keys[i:i + BUCKET_SIZE] for i in range(0, len(keys), BUCKET_SIZE)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.size = len(keys)
+
+    def remove(self, key):
+        i = bisect_left(self.maxes, key)
+        bucket = self.buckets[i]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+        self.size -= 1
+
+    def __iter__(self):
+        for bucket in self.buckets:
+            yield from bucket
+
+    def descending(self):
+        for bucket in reversed(self.buckets):
+            yield from reversed(bucket)
+
+    def irange(self, key):
+        """Keys greater than or equal to key, smallest first"""
+        i = bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            return
+        bucket = self.buckets[i]
+        yield from bucket[bisect_left(bucket, key):]
+        for bucket in self.buckets[i + 1:]:
+            yield from bucket
+
+    def below(self, key):
+        """Keys less than key, smallest first"""
+        for bucket in self.buckets:
+            if bucket[0] >= key:
+                return
+            if bucket[-1] < key:
+                yield from bucket
+            else:
+                yield from bucket[:bisect_left(bucket, key)]
+                return
+
+
+class Rankings:
+    """Balance, activity and movement rankings of a Bank's accounts.
+
+    Each account's entries are moved when it reports a change, so queries
+    read the top of an already sorted list instead of sorting the bank.
+    Movement is the balance change since the account was added or since
+    the last mark().
+    """
+
+    def __init__(self):
+        self.by_balance = SortedList()
+        self.by_count = SortedList()
+        self.by_movement = SortedList()
+        self.keys = {}  # account number -> (balance, transaction count, baseline, version)
+        self.lock = threading.Lock()
+
+    def update(self, number, balance, count, version):
+        """Move an account's entries; a change older than the ranked one is ignored"""
+        with self.lock:
+            old = self.keys.get(number)
+            if old is not None and old[3] >= version:
+                return
+            baseline = balance if old is None else old[2]
+            if old is not None:
+                self.by_balance.remove((old[0], number))
+                self.by_count.remove((old[1], number))
+                self.by_movement.remove((abs(old[0] - baseline), number))
+            self.by_balance.add((balance, number))
+            self.by_count.add((count, number))
+            self.by_movement.add((abs(balance - baseline), number))
+            self.keys[number] = (balance, count, baseline, version)
+
+    def add_many(self, entries):
+        """Rank (number, balance, count, version) entries, sorting each index once"""
+        balances, counts, movements, ranked = [], [], [], []
+        with self.lock:
+            for number, balance, count, version in entries:
+                if number in self.keys:
+                    ranked.append((number, balance, count, version))
+                    continue
+                balances.append((balance, number))
+                counts.append((count, number))
+                movements.append((0, number))
+                self.keys[number] = (balance, count, balance, version)
+            self.by_balance.update(balances)
+            self.by_count.update(counts)
+            self.by_movement.update(movements)
+        for entry in ranked:
+            self.update(*entry)
+
+    def mark(self):
+        """Start measuring movement from the current balances"""
+        with self.lock:
+            self.by_movement = SortedList()
+            for number, (balance, count, _, version) in self.keys.items():
+                self.keys[number] = (balance, count, balance, version)
+                self.by_movement.add((0, number))
+
+    def top_balances(self, n=10):
+        with self.lock:
+            return [(number, balance) for balance, number in islice(self.by_balance.descending(), n)]
+
+    def most_active(self, n=10):
+        with self.lock:
+            return [(number, count) for count, number in islice(self.by_count.descending(), n)]
+
+    def top_movers(self, n=10):
+        with self.lock:
+            return [(number, self.keys[number][0] - self.keys[number][2])
+                    for _, number in islice(self.by_movement.descending(), n)]
+
+    def below(self, threshold, limit=None):
+        """Accounts with a balance under threshold, lowest first"""
+        with self.lock:
+            keys = islice(self.by_balance.below((threshold, float("-inf"))), limit)
+            return [(number, balance) for balance, number in keys]
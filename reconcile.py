@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import os
+from multiprocessing import Pool
+from file_setup import accounts_file
+from ledger import ledger, Ledger
+from money import to_cents, format_cents
+from storage import read_table
+
+CHECKPOINT_FILE = "reconcile_checkpoint.json"
+RECONCILE_TOLERANCE = 0  # cents
+
+SIGNS = {"DEPOSIT": 1, "TRANSFER_CREDIT": 1, "WITHDRAW": -1, "TRANSFER_DEBIT": -1, "FEE": -1}
+
+
+def signed(row):
+    return SIGNS.get(row["type"], 0) * to_cents(row["amount"])
+
+
+def _aggregate(args):
+    directory, segment = args
+    totals = {}
+    rows = 0
+    for row in Ledger(directory).segment_rows(segment):
+        # Rows reversed in place by the old single-file ledger.
+        if row["status"] == "REVERSED":
+            continue
+        amount = signed(row)
+        if amount:
+            acc_no = row["account_number"]
+            totals[acc_no] = totals.get(acc_no, 0) + amount
+        rows += 1
+    return segment["file"], segment["sealed"], totals, rows
+
+
+def _merge(into, totals, sign=1):
+    for acc_no, amount in totals.items():
+        into[acc_no] = into.get(acc_no, 0) + sign * amount
+
+
+class Reconciliation:
+    """Checks accounts.csv balances against the balances the ledger implies.
+
+    expected = opening + sum(signed ledger amounts) - sum(signed reversed amounts)
+
+    Sealed segments never change, so their per-account sums are kept in a
+    checkpoint and only new segments (and the open one) are read on a re-run.
+    Reversals are tracked by how far into the reversal overlay the last run got.
+    All amounts are integer cents.
+    """
+
+    def __init__(self, checkpoint=CHECKPOINT_FILE, workers=None):
+        self.checkpoint_path = checkpoint
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as f:
+                state = json.load(f)
+            if state.get("units") != "cents":
+                # Written when amounts were float dollars.
+                for totals in (state["opening"], state["base"]):
+                    for acc_no, amount in totals.items():
+                        totals[acc_no] = to_cents(amount)
+                for entry in state["reversed"].values():
+                    entry[1] = to_cents(entry[1])
+                state["units"] = "cents"
+            return state
+        return {"opening": {}, "base": {}, "segments": [], "rows": 0,
+                "reversed": {}, "reversals_offset": 0, "units": "cents"}
+
+    def save_checkpoint(self, state):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _aggregate_new(self, state):
+        done = set(state["segments"])
+        todo = [s for s in ledger.manifest()["segments"] if s["file"] not in done]
+        active = {}
+        jobs = [(ledger.directory, s) for s in todo]
+        if self.workers > 1 and len(jobs) > 1:
+            with Pool(min(self.workers, len(jobs))) as pool:
+                results = list(pool.imap_unordered(_aggregate, jobs))
+        else:
+            results = [_aggregate(job) for job in jobs]
+
+        for name, sealed, totals, rows in results:
+            if sealed:
+                _merge(state["base"], totals)
+                state["segments"].append(name)
+                state["rows"] += rows
+            else:
+                _merge(active, totals)
+        return active
+
+    def _apply_reversals(self, state):
+        path = ledger.reversals_path
+        if not os.path.exists(path):
+            return
+        with open(path, "r", newline="") as f:
+            f.seek(state["reversals_offset"])
+            if state["reversals_offset"] == 0:
+                f.readline()
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break
+                tid = line.split(",", 1)[0]
+                row = ledger.find(tid)
+                if row is not None and tid not in state["reversed"]:
+                    state["reversed"][tid] = [row["account_number"], signed(row)]
+                state["reversals_offset"] = f.tell()
+
+    def run(self, baseline=False, full=False, out=None):
+        state = self.load_checkpoint()
+        if full:
+            state.update(base={}, segments=[], rows=0, reversed={}, reversals_offset=0)
+
+        active = self._aggregate_new(state)
+        self._apply_reversals(state)
+
+        implied = dict(state["opening"])
+        _merge(implied, state["base"])
+        _merge(implied, active)
+        for acc_no, amount in state["reversed"].values():
+            implied[acc_no] = implied.get(acc_no, 0) - amount
+
+        balances = {row["account_number"]: to_cents(row["balance"])
+                    for row in read_table(accounts_file)[1]}
+
+        if baseline:
+            # Accept today's balances: whatever the ledger does not explain
+            # becomes each account's opening balance.
+            for acc_no, balance in balances.items():
+                state["opening"][acc_no] = (state["opening"].get(acc_no, 0)
+                                            + balance - implied.get(acc_no, 0))
+                implied[acc_no] = balance
+
+        discrepancies = []
+        for acc_no in sorted(set(balances) | set(implied)):
+            actual = balances.get(acc_no)
+            expected = implied.get(acc_no, 0)
+            if actual is None or abs(actual - expected) > RECONCILE_TOLERANCE:
+                discrepancies.append((acc_no, actual, expected))
+
+        self.save_checkpoint(state)
+
+        if out:
+            with open(out, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["account_number", "balance", "ledger_balance", "difference"])
+                for acc_no, actual, expected in discrepancies:
+                    diff = "" if actual is None else format_cents(actual - expected)
+                    writer.writerow([acc_no, "" if actual is None else format_cents(actual),
+                                     format_cents(expected), diff])
+        return discrepancies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile accounts.csv against the ledger")
+    parser.add_argument("--baseline", action="store_true",
+                        help="record current balances as opening balances")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore checkpointed segment totals and rescan everything")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default=None, help="write discrepancies to this CSV")
+    args = parser.parse_args()
+
+    found = Reconciliation(workers=args.workers).run(args.baseline, args.full, args.out)
+    print("\n===== RECONCILIATION =====")
+    if not found:
+        print("All balances agree with the ledger")
+    for acc_no, actual, expected in found:
+        if actual is None:
+            print(f"{acc_no}: missing from accounts, ledger implies {format_cents(expected)}")
+        else:
+            print(f"{acc_no}: balance {format_cents(actual)}, ledger implies "
+                  f"{format_cents(expected)}, difference {format_cents(actual - expected)}")
@@ -1,20 +1,19 @@
-import csv
-from file_setup import transactions_file
+from engine import engine
+from money import to_cents, format_cents
 
 class TransactionReport:
     @staticmethod
-    def generate():
+    def generate(since=None, until=None):
         total_deposit = 0
         total_withdraw = 0
 
-        with open(transactions_file, "r") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row["type"] == "DEPOSIT":
-                    total_deposit += float(row["amount"])
-                elif row["type"] == "WITHDRAW":
-                    total_withdraw += float(row["amount"])
+        # Both totals come from the same point in time.
+        with engine.snapshot() as snap:
+            for row in snap.transactions(since=since, until=until, t_type="DEPOSIT"):
+                total_deposit += to_cents(row["amount"])
+            for row in snap.transactions(since=since, until=until, t_type="WITHDRAW"):
+                total_withdraw += to_cents(row["amount"])
 
         print("\n===== REPORT =====")
-        print("Total Deposits:", total_deposit)
-        print("Total Withdrawals:", total_withdraw)
+        print("Total Deposits:", format_cents(total_deposit))
+        print("Total Withdrawals:", format_cents(total_withdraw))
@@ -0,0 +1,64 @@
+import csv
+import mmap
+import os
+
+
+def scan(buf, fields, column, value, start=0, end=None):
+    """Rows of buf whose field number `column` equals value.
+
+    buf is any bytes-like CSV body (an mmap, or a decompressed block) whose
+    data lines begin at offset start and stop at end. Candidate lines are found with a byte
+    search for the delimited value and only those lines are parsed, so rows
+    that do not match are never decoded or turned into dicts. A line without
+    its terminating newline (a write still in progress) is ignored.
+    """
+    raw = value.encode()
+    if end is None:
+        end = len(buf)
+    if column == 0:
+        needle = b"\n" + raw + b","
+        if buf[start:start + len(raw) + 1] == raw + b",":
+            first_end = buf.find(b"\n", start, end)
+            if first_end != -1:
+                row = _parse(buf[start:first_end], column, value)
+                if row is not None:
+                    yield dict(zip(fields, row))
+    elif column == len(fields) - 1:
+        needle = b"," + raw
+    else:
+        needle = b"," + raw + b","
+
+    pos = buf.find(needle, start, end)
+    while pos != -1:
+        nl = buf.rfind(b"\n", start, pos + 1)
+        line_start = nl + 1 if nl != -1 else start
+        line_end = buf.find(b"\n", pos + 1, end)
+        if line_end == -1:
+            return
+        row = _parse(buf[line_start:line_end], column, value)
+        if row is not None:
+            yield dict(zip(fields, row))
+        pos = buf.find(needle, line_end, end)
+
+
+def _parse(line, column, value):
+    row = next(csv.reader([line.decode().rstrip("\r")]), None)
+    if row is None or len(row) <= column or row[column] != value:
+        return None
+    return row
+
+
+def scan_file(path, field, value, end=None):
+    """Rows of a CSV file (with header) whose `field` equals value, via mmap.
+
+    With end, only the first end bytes of the file are searched.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            header_end = buf.find(b"\n")
+            if header_end == -1:
+                return
+            fields = next(csv.reader([buf[:header_end].decode().rstrip("\r")]))
+            yield from scan(buf, fields, fields.index(field), value, header_end + 1, end)
@@ -0,0 +1,204 @@
+import threading
+from array import array
+from collections import Counter
+from itertools import islice
+from math import ceil
+from ranking import SortedList
+
+PAGE_SIZE = 20
+FUZZY_THRESHOLD = 0.3
+FUZZY_MAX_CANDIDATES = 5000
+FUZZY_MAX_EDITS = 1
+FUZZY_MIN_WORD = 3  # shorter words are not matched by edits
+
+
+def normalize(name):
+    return " ".join(name.casefold().split())
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletes(word):
+    """word and every string one character shorter than it"""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def edit_distance(a, b, limit=FUZZY_MAX_EDITS):
+    """Edits between a and b, counting a swap of neighbours as one; limit + 1 if more"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        before, prev = prev, row
+    return min(prev[-1], limit + 1)
+
+
+class NameIndex:
+    """Account holder names, searchable by prefix and by approximate match.
+
+    Prefix search walks a sorted list of (word, account number) keys, one
+    per word of each name plus one for the whole name, so "smi" finds
+    "John Smith" and so does "john sm". Approximate search scores names by
+    their share of trigrams with the query. Candidates come from the
+    postings of the query's rarest trigrams only, as many as a match must
+    hit, and at most FUZZY_MAX_CANDIDATES of them. Words one edit away
+    (a swap of neighbours included, so "jnae" finds "jane") are found
+    through an index of each word with one letter deleted, and their
+    names are scored as if the query had been spelled that way.
+    Results are paged, page 0 first.
+    """
+
+    def __init__(self):
+        self.words = SortedList()
+        self.postings = {}  # trigram -> array of account numbers
+        self.names = {}  # account number -> normalized name
+        self.sizes = {}  # account number -> trigram count of the name
+        self.variants = {}  # word with at most one letter deleted -> words
+        self.word_counts = Counter()  # word -> names holding it
+        self.lock = threading.Lock()
+
+    def add(self, account_number, name):
+        with self.lock:
+            for word in self._index(account_number, name):
+                self.words.add((word, account_number))
+
+    def add_many(self, items):
+        """Index (account_number, name) pairs, sorting the word list once"""
+        with self.lock:
+            self.words.update((word, number) for number, name in items
+                              for word in self._index(number, name))
+
+    def _index(self, account_number, name):
+        # Everything but the word list; returns the words to add to it.
+        name = normalize(name)
+        if account_number in self.names:
+            if self.names[account_number] == name:
+                return set()
+            self._remove(account_number)
+        grams = trigrams(name)
+        self.names[account_number] = name
+        self.sizes[account_number] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, array("q")).append(account_number)
+        for word in set(name.split()):
+            if len(word) >= FUZZY_MIN_WORD and not self.word_counts[word]:
+                for variant in deletes(word):
+                    self.variants.setdefault(variant, set()).add(word)
+            self.word_counts[word] += 1
+        return self._keys(name)
+
+    @staticmethod
+    def _keys(name):
+        words = set(name.split())
+        if len(words) > 1:
+            words.add(name)
+        return words
+
+    def _remove(self, account_number):
+        name = self.names.pop(account_number)
+        del self.sizes[account_number]
+        for word in self._keys(name):
+            self.words.remove((word, account_number))
+        for gram in trigrams(name):
+            posting = self.postings[gram]
+            del posting[posting.index(account_number)]
+        for word in set(name.split()):
+            self.word_counts[word] -= 1
+            if self.word_counts[word]:
+                continue
+            del self.word_counts[word]
+            if len(word) >= FUZZY_MIN_WORD:
+                for variant in deletes(word):
+                    self.variants[variant].discard(word)
+                    if not self.variants[variant]:
+                        del self.variants[variant]
+
+    def prefix(self, prefix, page=0, page_size=PAGE_SIZE):
+        """[(account_number, name)] with a word starting with prefix, by word"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            seen = set()
+            matches = []
+            for word, number in self.words.irange((prefix,)):
+                if not word.startswith(prefix):
+                    break
+                if number in seen:
+                    continue
+                seen.add(number)
+                matches.append(number)
+                if len(matches) >= (page + 1) * page_size:
+                    break
+            return [(number, self.names[number]) for number in matches[page * page_size:]]
+
+    def fuzzy(self, query, page=0, page_size=PAGE_SIZE, threshold=FUZZY_THRESHOLD):
+        """[(account_number, name, score)] most similar first"""
+        query = normalize(query)
+        if not query:
+            return []
+        grams = trigrams(query)
+        with self.lock:
+            scores = {}
+            # A similarity of threshold needs at least this many shared
+            # trigrams, so every match holds one of the len(grams) - needed + 1
+            # rarest; the postings of the common ones are never walked.
+            needed = max(1, ceil(threshold * len(grams)))
+            rarest = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+            for gram in rarest[:len(grams) - needed + 1]:
+                room = FUZZY_MAX_CANDIDATES - len(scores)
+                for number in islice(self.postings.get(gram, ()), room):
+                    if number not in scores:
+                        scores[number] = self._similarity(grams, number)
+
+            for word, other, edits in self._near_words(query):
+                spelled = trigrams(" ".join(other if w == word else w for w in query.split()))
+                penalty = 1 - edits / len(word)
+                for number in self._holders(other, FUZZY_MAX_CANDIDATES - len(scores)):
+                    score = self._similarity(spelled, number) * penalty
+                    if score > scores.get(number, 0):
+                        scores[number] = score
+
+            scored = sorted((-score, number) for number, score in scores.items()
+                            if score >= threshold)
+            return [(number, self.names[number], round(-score, 3))
+                    for score, number in islice(scored, page * page_size, (page + 1) * page_size)]
+
+    def _similarity(self, grams, number):
+        # A trigram of the name is a substring of its padded form.
+        padded = f"  {self.names[number]} "
+        shared = sum(gram in padded for gram in grams)
+        return shared / (len(grams) + self.sizes[number] - shared)
+
+    def _near_words(self, query):
+        # (query word, indexed word, edits) for words within FUZZY_MAX_EDITS.
+        for word in set(query.split()):
+            if len(word) < FUZZY_MIN_WORD:
+                continue
+            found = set()
+            for variant in deletes(word):
+                found.update(self.variants.get(variant, ()))
+            for other in found:
+                edits = edit_distance(word, other)
+                if 0 < edits <= FUZZY_MAX_EDITS:
+                    yield word, other, edits
+
+    def _holders(self, word, limit):
+        # Account numbers whose name has word, from the word list.
+        holders = []
+        for key, number in self.words.irange((word,)):
+            if key != word or len(holders) >= limit:
+                break
+            holders.append(number)
+        return holders
@@ -0,0 +1,81 @@
+import threading
+
+SHARD_COUNT = 8
+
+
+class ShardedBalance:
+    """A non-negative balance in cents split into independently locked shards.
+
+    Each thread credits and debits its own shard, so concurrent operations
+    on one hot account rarely wait on each other. A debit its shard cannot
+    cover takes every shard lock (always in index order), checks the merged
+    total and drains the other shards into it. Shards never go below zero,
+    so a debit that fits in one shard always fits in the total.
+
+    This only scales moves made in memory. A balance kept in storage
+    commits every move through its store, one at a time, and only mirrors
+    the result here.
+    """
+
+    def __init__(self, balance=0, shards=SHARD_COUNT):
+        self.shards = self._split(balance, shards)
+        self.locks = [threading.Lock() for _ in range(shards)]
+
+    @staticmethod
+    def _split(balance, shards):
+        share, extra = divmod(balance, shards)
+        return [share + 1] * extra + [share] * (shards - extra)
+
+    def _shard(self):
+        return threading.get_ident() % len(self.shards)
+
+    def _lock_all(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def _unlock_all(self):
+        for lock in reversed(self.locks):
+            lock.release()
+
+    def total(self):
+        self._lock_all()
+        try:
+            return sum(self.shards)
+        finally:
+            self._unlock_all()
+
+    def reset(self, balance):
+        self._lock_all()
+        try:
+            self.shards = self._split(balance, len(self.shards))
+        finally:
+            self._unlock_all()
+
+    def credit(self, amount):
+        i = self._shard()
+        with self.locks[i]:
+            self.shards[i] += amount
+
+    def debit(self, amount):
+        """Take amount out; False (and nothing taken) if the total is short"""
+        i = self._shard()
+        with self.locks[i]:
+            if self.shards[i] >= amount:
+                self.shards[i] -= amount
+                return True
+
+        self._lock_all()
+        try:
+            if sum(self.shards) < amount:
+                return False
+            # Borrow from the other shards until this one covers the debit.
+            for j in range(len(self.shards)):
+                if j == i or self.shards[i] >= amount:
+                    continue
+                moved = min(self.shards[j], amount - self.shards[i])
+                self.shards[j] -= moved
+                self.shards[i] += moved
+            self.shards[i] -= amount
+            return True
+        finally:
+            self._unlock_all()
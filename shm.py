@@ -0,0 +1,287 @@
+import fcntl
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from engine import engine
+from money import to_cents
+
+SHM_NAME = "bank_balances"
+SHM_LOCK_FILE = "bank_balances.lock"
+SHM_MIN_CAPACITY = 1 << 16
+SHM_PERSIST_INTERVAL = 5.0
+
+MAGIC = b"BALTAB02"
+HEADER = struct.Struct("<8sQ")  # magic, slot count
+# Slot: sequence number, account number (0 for a free slot), balance in cents.
+SLOT = struct.Struct("<Qqq")
+SEQ = struct.Struct("<Q")
+BODY = struct.Struct("<qq")
+ACCOUNT = struct.Struct("<q")
+
+
+def _key(acc_no):
+    try:
+        acc_no = int(acc_no)
+    except (TypeError, ValueError):
+        return None
+    return acc_no if acc_no > 0 else None
+
+
+class BalanceTable:
+    """Account balances in shared memory, for worker processes on one host.
+
+    Slots form an open-addressed hash table keyed by account number, so a
+    balance is found without any copy of the accounts. Writers make a
+    slot's sequence number odd while they change it and even again after;
+    readers take no lock and retry if they saw an odd or changed number.
+    Writers lock each slot they change with a one-byte lockf lock on a lock
+    file, always in slot order, so a transfer moves both balances or
+    neither. Byte 0 of that file guards claiming free slots.
+
+    Pass capacity to create the table; leave it out to attach to one.
+    """
+
+    def __init__(self, name=SHM_NAME, capacity=None, lock_path=SHM_LOCK_FILE):
+        if capacity is not None:
+            size = 1
+            while size < capacity:
+                size <<= 1
+            self.shm = shared_memory.SharedMemory(name, create=True,
+                                                  size=HEADER.size + size * SLOT.size)
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, size)
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            # Before 3.13 an attaching process registers the segment too, and
+            # its resource tracker would unlink it when the process exits.
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+            magic, size = HEADER.unpack_from(self.shm.buf, 0)
+            if magic != MAGIC:
+                self.shm.close()
+                raise ValueError(f"{name} is not a balance table")
+        self.owner = capacity is not None
+        self.capacity = size
+        self.buf = self.shm.buf
+        self.lock_file = open(lock_path, "a+")
+        self.lock = threading.Lock()  # lockf locks do not exclude threads
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        self.lock_file.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # slots
+
+    @staticmethod
+    def _offset(i):
+        return HEADER.size + i * SLOT.size
+
+    def _probe(self, acc_no):
+        # Slot holding acc_no, or the free slot where it would go.
+        mask = self.capacity - 1
+        i = (acc_no * 0x9E3779B97F4A7C15 >> 17) & mask
+        for _ in range(self.capacity):
+            found = ACCOUNT.unpack_from(self.buf, self._offset(i) + SEQ.size)[0]
+            if found == acc_no or found == 0:
+                return i, found == acc_no
+            i = (i + 1) & mask
+        return None, False
+
+    def _read(self, i):
+        offset = self._offset(i)
+        while True:
+            seq, acc_no, balance = SLOT.unpack_from(self.buf, offset)
+            if not seq & 1 and SEQ.unpack_from(self.buf, offset)[0] == seq:
+                return seq, acc_no, balance
+            time.sleep(0)
+
+    def _write(self, i, acc_no, balance):
+        # Caller holds the slot lock.
+        offset = self._offset(i)
+        seq = SEQ.unpack_from(self.buf, offset)[0]
+        SEQ.pack_into(self.buf, offset, seq + 1)
+        BODY.pack_into(self.buf, offset + SEQ.size, acc_no, balance)
+        SEQ.pack_into(self.buf, offset, seq + 2)
+
+    def _lock(self, slots):
+        for i in slots:
+            fcntl.lockf(self.lock_file, fcntl.LOCK_EX, 1, i + 1)
+
+    def _unlock(self, slots):
+        for i in reversed(slots):
+            fcntl.lockf(self.lock_file, fcntl.LOCK_UN, 1, i + 1)
+
+    # balances
+
+    def get(self, acc_no):
+        """Balance of acc_no in cents, or None if the table does not hold it"""
+        acc_no = _key(acc_no)
+        if acc_no is None:
+            return None
+        i, found = self._probe(acc_no)
+        return self._read(i)[2] if found else None
+
+    def add(self, acc_no, balance):
+        """Put acc_no in the table unless it is there; False if the table is full"""
+        key = _key(acc_no)
+        if key is None:
+            return False
+        with self.lock:
+            fcntl.lockf(self.lock_file, fcntl.LOCK_EX, 1, 0)
+            try:
+                i, found = self._probe(key)
+                if i is None:
+                    print("Balance table full!")
+                    return False
+                if not found:
+                    self._write(i, key, balance)
+                return True
+            finally:
+                fcntl.lockf(self.lock_file, fcntl.LOCK_UN, 1, 0)
+
+    def set(self, acc_no, balance):
+        key = _key(acc_no)
+        i, found = self._probe(key) if key is not None else (None, False)
+        if not found:
+            return self.add(acc_no, balance)
+        with self.lock:
+            self._lock([i])
+            try:
+                self._write(i, key, balance)
+            finally:
+                self._unlock([i])
+        return True
+
+    def adjust(self, mutations):
+        # mutations: [(acc_no, delta, floor)], applied together or not at all;
+        # same results as GroupCommit.submit.
+        slots = {}
+        for acc_no, _, _ in mutations:
+            key = _key(acc_no)
+            i, found = self._probe(key) if key is not None else (None, False)
+            if not found:
+                return False, "INVALID"
+            slots[acc_no] = i
+        order = sorted(set(slots.values()))
+
+        with self.lock:
+            self._lock(order)
+            try:
+                new = {}
+                for acc_no, delta, floor in mutations:
+                    balance = new.get(acc_no, self._read(slots[acc_no])[2]) + delta
+                    if floor is not None and balance < floor:
+                        return False, "INSUFFICIENT"
+                    new[acc_no] = balance
+                for acc_no, balance in new.items():
+                    self._write(slots[acc_no], _key(acc_no), balance)
+                return True, new
+            finally:
+                self._unlock(order)
+
+    def load(self, rows):
+        """Add every {account_number, balance} row; False once the table is full"""
+        for row in rows:
+            if not self.add(row["account_number"], to_cents(row["balance"])):
+                return False
+        return True
+
+    def sequences(self):
+        """Sequence number of every slot; a slot changed if its number did"""
+        words = self.buf[HEADER.size:].cast("Q")
+        try:
+            return words[::SLOT.size // SEQ.size].tolist()
+        finally:
+            words.release()
+
+
+class BalancePersister:
+    """Writes the balance moves made in a BalanceTable back to the table file.
+
+    Run by one designated process; workers only touch shared memory. Moves
+    are written as credits against the balance the file last got for each
+    slot, so anything else committed to the file meanwhile is kept.
+    """
+
+    def __init__(self, table, engine=engine, interval=SHM_PERSIST_INTERVAL):
+        self.table = table
+        self.engine = engine
+        self.interval = interval
+        self.seen = table.sequences()
+        # slot -> balance the file holds for its account
+        self.stored = {i: table._read(i)[2] for i, seq in enumerate(self.seen) if seq}
+
+    def persist(self):
+        current = self.table.sequences()
+        changed = [i for i, (old, new) in enumerate(zip(self.seen, current)) if old != new]
+        if not changed:
+            return 0
+        accounts = None
+        credits = {}
+        balances = {}
+        for i in changed:
+            seq, acc_no, balance = self.table._read(i)
+            if i not in self.stored:
+                # Added after loading, with the balance of the account's row.
+                if accounts is None:
+                    accounts = self.engine.accounts()
+                row = accounts.get(str(acc_no))
+                if row is None:
+                    current[i] = self.seen[i]  # row not written yet
+                    continue
+                self.stored[i] = to_cents(row["balance"])
+            current[i] = seq
+            if balance != self.stored[i]:
+                credits[str(acc_no)] = balance - self.stored[i]
+                balances[i] = balance
+        ok, result = self.engine.post(credits)
+        if not ok:
+            print(f"Error persisting balances: {result}")
+            return 0
+        self.stored.update(balances)
+        self.seen = current
+        return len(credits)
+
+    def run(self):
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.persist()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.persist()
+
+
+def serving(name=SHM_NAME):
+    """True if a balance table is being served"""
+    try:
+        BalanceTable(name).close()
+    except (FileNotFoundError, ValueError):
+        return False
+    return True
+
+
+def attach(engine=engine, name=SHM_NAME):
+    """Use the shared balance table if one is being served; True if attached"""
+    try:
+        table = BalanceTable(name)
+    except (FileNotFoundError, ValueError):
+        return False
+    engine.attach_balances(table)
+    return True
+
+
+if __name__ == "__main__":
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else SHM_PERSIST_INTERVAL
+    accounts = list(engine.accounts().values())
+    table = BalanceTable(capacity=max(2 * len(accounts), SHM_MIN_CAPACITY))
+    table.load(accounts)
+    print(f"Serving {len(accounts)} balances in shared memory, Ctrl-C to stop")
+    try:
+        BalancePersister(table, interval=interval).run()
+    finally:
+        table.close()
@@ -0,0 +1,296 @@
+import csv
+import fcntl
+import os
+import time
+from operator import itemgetter
+from file_setup import accounts_file
+from idgen import new_id, id_timestamp
+from money import to_cents, format_cents
+
+ACCOUNT_FIELDS = ["account_number", "name", "balance", "status", "account_type",
+                  "interest_month"]
+DEFAULT_ACCOUNT_TYPE = "Savings"
+
+# Header of the accounts file as Project.Bank used to write it.
+PROJECT_ACCOUNT_FIELDS = {"AccountNumber": "account_number", "AccountHolder": "name",
+                          "Balance": "balance", "AccountType": "account_type"}
+
+# How long applied group results stay in the commit log. A submitter reads
+# its result as soon as it gets the lock, so this only has to outlive the
+# longest lock wait.
+COMMIT_RETENTION = 300
+COMMIT_LOG_SIZE = 4 * 1024 * 1024
+COMMIT_BLOCK = 64 * 1024
+COMMIT_POLL_MIN = 0.0005
+COMMIT_POLL_MAX = 0.01
+# Commit times are compared with group ids issued by other processes; this
+# much clock disagreement is tolerated.
+COMMIT_CLOCK_SLACK = 2.0
+
+
+class FileLock:
+    def __init__(self, path, shared=False, blocking=True):
+        self.path = path + ".lock"
+        self.shared = shared
+        self.blocking = blocking
+        self.acquired = False
+        self.f = None
+
+    def __enter__(self):
+        self.f = open(self.path, "a+")
+        mode = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        if not self.blocking:
+            mode |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(self.f, mode)
+            self.acquired = True
+        except BlockingIOError:
+            self.acquired = False
+        return self
+
+    def __exit__(self, *exc):
+        if self.acquired:
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+            self.acquired = False
+        self.f.close()
+        self.f = None
+
+
+def normalize_account(row):
+    """An accounts row in any older layout, as a row of ACCOUNT_FIELDS"""
+    if "account_number" not in row:
+        row = {new: row.get(old, "") for old, new in PROJECT_ACCOUNT_FIELDS.items()}
+        row["status"] = "active"
+    row = {field: row.get(field) or "" for field in ACCOUNT_FIELDS}
+    if not row["account_type"]:
+        row["account_type"] = DEFAULT_ACCOUNT_TYPE
+    return row
+
+
+def read_table(path):
+    with open(path, "r", newline="") as f:
+        return parse_table(f)
+
+
+def parse_table(f):
+    reader = csv.DictReader(f)
+    rows = list(reader)
+    fieldnames = reader.fieldnames or list(ACCOUNT_FIELDS)
+    if fieldnames != ACCOUNT_FIELDS:
+        # Older layouts are upgraded in memory; the next write stores them
+        # in the common schema.
+        rows = [normalize_account(row) for row in rows]
+        fieldnames = list(ACCOUNT_FIELDS)
+    return fieldnames, rows
+
+
+def stage_table(path, rows, fieldnames=ACCOUNT_FIELDS):
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        # Rows come from read_table and carry every field, so plain tuples
+        # can be written without DictWriter's per-row key checks.
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        writer.writerows(map(itemgetter(*fieldnames), rows))
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+
+def write_table(path, rows, fieldnames=ACCOUNT_FIELDS):
+    # Readers never see a half written table: the new version is written
+    # beside the old one and swapped in with a single rename.
+    os.replace(stage_table(path, rows, fieldnames), path)
+
+
+class GroupCommit:
+    """Applies balance mutations from any number of processes.
+
+    A mutation group is a list of (account_number, delta, floor) tuples, in
+    integer cents, that is applied atomically: either every balance moves or none does. Callers
+    append their group to a shared journal and then take the table lock;
+    whoever holds the lock applies every pending group in one read/write of
+    the table, so waiting callers usually find their group already done.
+    """
+
+    def __init__(self, path=accounts_file):
+        self.path = path
+        self.journal = path + ".journal"
+        self.commits = path + ".commits"
+
+    def submit(self, mutations):
+        gid = new_id()
+        lines = "".join(f"{gid},{acc_no},{format_cents(delta)},"
+                        f"{'' if floor is None else format_cents(floor)}\n"
+                        for acc_no, delta, floor in mutations)
+        with open(self.journal, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(lines)
+            f.flush()
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+        # Waiters do not queue on the lock: if another holder has already
+        # committed our group, the result is in the commit log.
+        delay = COMMIT_POLL_MIN
+        while True:
+            with FileLock(self.path, blocking=False) as lock:
+                if lock.acquired:
+                    results = self.commit_pending()
+                    if gid in results:
+                        return results[gid]
+                    return self._lookup(gid)
+            result = self._lookup(gid, missing=None)
+            if result is not None:
+                return result
+            time.sleep(delay)
+            delay = min(delay * 2, COMMIT_POLL_MAX)
+
+    def _read_journal(self):
+        groups = {}
+        if not os.path.exists(self.journal):
+            return groups
+        with open(self.journal, "r") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            for line in f:
+                parts = line.rstrip("\n").split(",")
+                if len(parts) != 4:
+                    continue
+                gid, acc_no, delta, floor = parts
+                groups.setdefault(gid, []).append(
+                    (acc_no, to_cents(delta), to_cents(floor) if floor else None))
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return groups
+
+    def _drop_journal(self, gids):
+        with open(self.journal, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            keep = [line for line in f if line.split(",", 1)[0] not in gids]
+            f.seek(0)
+            f.writelines(keep)
+            f.truncate()
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _commit_lines(self):
+        # Newest first. Results are looked up right after they are written,
+        # so reading the log backwards finds them after a block or two.
+        if not os.path.exists(self.commits):
+            return
+        with open(self.commits, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            partial = b""
+            while pos > 0:
+                step = min(COMMIT_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + partial).split(b"\n")
+                partial = lines.pop(0) if pos > 0 else b""
+                for line in reversed(lines):
+                    parts = line.decode().split(",")
+                    if len(parts) == 4:
+                        yield parts
+
+    @staticmethod
+    def _result(status, balances):
+        if status != "OK":
+            return False, status
+        pairs = (item.split(":") for item in balances.split(";") if item)
+        return True, {acc_no: to_cents(bal) for acc_no, bal in pairs}
+
+    def _lookup(self, gid, missing=(False, "LOST")):
+        # A group is committed after its id was issued and the log is in
+        # commit order, so the search ends at the first entry committed
+        # before that.
+        issued = id_timestamp(gid) - COMMIT_CLOCK_SLACK
+        for entry_gid, status, ts, balances in self._commit_lines():
+            if entry_gid == gid:
+                return self._result(status, balances)
+            if float(ts) < issued:
+                break
+        return missing
+
+    def _logged(self, groups):
+        # Only the batch of a holder that died mid-commit can be both logged
+        # and still journaled, and that batch is at the end of the log.
+        logged = set()
+        for i, parts in enumerate(self._commit_lines()):
+            if i >= len(groups):
+                break
+            if parts[0] in groups:
+                logged.add(parts[0])
+        return logged
+
+    def commit_pending(self):
+        # Caller must hold FileLock(self.path).
+        groups = self._read_journal()
+        if not groups:
+            return {}
+
+        done = self._logged(groups)
+        tmp = self.path + ".tmp"
+        if os.path.exists(tmp):
+            # A previous holder died between logging its batch and swapping
+            # the table in. Finish its swap if the batch was logged.
+            if any(gid in done for gid in groups):
+                os.replace(tmp, self.path)
+            else:
+                os.remove(tmp)
+
+        pending = [(gid, muts) for gid, muts in groups.items() if gid not in done]
+        results = {}
+        log = []
+        if pending:
+            fieldnames, rows = read_table(self.path)
+            index = {row["account_number"]: row for row in rows}
+            now = time.time()
+            for gid, muts in pending:
+                status, balances = self._apply(index, muts)
+                log.append(f"{gid},{status},{now:.3f},{balances}\n")
+                results[gid] = self._result(status, balances)
+
+            applied = any(line.split(",")[1] == "OK" for line in log)
+            if applied:
+                stage_table(self.path, rows, fieldnames)
+            self._log_commits(log, now)
+            if applied:
+                os.replace(tmp, self.path)
+
+        self._drop_journal(set(groups))
+        return results
+
+    @staticmethod
+    def _apply(index, mutations):
+        new = {}
+        for acc_no, delta, floor in mutations:
+            row = index.get(acc_no)
+            if row is None or row["status"] != "active":
+                return "INVALID", ""
+            balance = new.get(acc_no, to_cents(row["balance"])) + delta
+            if floor is not None and balance < floor:
+                return "INSUFFICIENT", ""
+            new[acc_no] = balance
+        for acc_no, balance in new.items():
+            index[acc_no]["balance"] = format_cents(balance)
+        return "OK", ";".join(f"{acc_no}:{format_cents(balance)}" for acc_no, balance in new.items())
+
+    def _log_commits(self, log, now):
+        with open(self.commits, "a+") as f:
+            f.writelines(log)
+            f.flush()
+            os.fsync(f.fileno())
+            if f.tell() < COMMIT_LOG_SIZE:
+                return
+            f.seek(0)
+            lines = f.readlines()
+
+        cutoff = now - COMMIT_RETENTION
+        keep = [line for line in lines
+                if len(line.split(",")) == 4 and float(line.split(",")[2]) >= cutoff]
+        tmp = self.commits + ".tmp"
+        with open(tmp, "w") as f:
+            f.writelines(keep)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.commits)
+
+
+group_commit = GroupCommit()
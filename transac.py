@@ -1,23 +1,27 @@
-import csv
-import uuid
 from datetime import datetime
-from file_setup import transactions_file
+from idgen import new_id
+from engine import engine
+from money import format_cents
 
 class Transaction:
+    # amount is in integer cents.
     def __init__(self, acc_no, amount, t_type):
-        self.transaction_id = str(uuid.uuid4())[:8]
+        self.transaction_id = new_id()
         self.acc_no = acc_no
         self.amount = amount
         self.t_type = t_type
         self.date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.status = "SUCCESS"
 
+    def row(self):
+        return [self.transaction_id,
+                self.acc_no,
+                self.t_type,
+                format_cents(self.amount),
+                self.date,
+                self.status]
+
     def save(self):
-        with open(transactions_file, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([self.transaction_id,
-                             self.acc_no,
-                             self.t_type,
-                             self.amount,
-                             self.date,
-                             self.status])
+        # Buffered: written with the rest of the batch when the command that
+        # made it finishes (cli.run flushes), or once the buffer fills.
+        engine.log([self.row()])
@@ -1,12 +1,19 @@
 from accounts import AccountValidation
 from balance import BalanceManagement
-from transaction import Transaction
+from transac import Transaction
 from notification import Notification
 from fraud import FraudDetection
+from idempotency import idempotency
+from money import to_cents, format_cents
 
 class FundTransfer:
     @staticmethod
-    def transfer(sender, receiver, amount):
+    def transfer(sender, receiver, amount, idempotency_key=None):
+        return idempotency.run(idempotency_key, ["transfer", sender, receiver, amount],
+                               lambda: FundTransfer._transfer(sender, receiver, amount))
+
+    @staticmethod
+    def _transfer(sender, receiver, amount):
         s_acc = AccountValidation.get_account(sender)
         r_acc = AccountValidation.get_account(receiver)
 
@@ -14,20 +21,22 @@ class FundTransfer:
             print("Invalid sender or receiver")
             return
 
-        if float(s_acc["balance"]) < amount:
+        if to_cents(s_acc["balance"]) < amount:
             print("Insufficient balance")
             return
 
-        FraudDetection.check(amount)
+        FraudDetection.check(amount, sender)
 
-        BalanceManagement.update_balance(sender,
-            float(s_acc["balance"]) - amount)
-
-        BalanceManagement.update_balance(receiver,
-            float(r_acc["balance"]) + amount)
+        ok, result = BalanceManagement.adjust([(sender, -amount, 0),
+                                               (receiver, amount, None)])
+        if not ok:
+            print("Insufficient balance" if result == "INSUFFICIENT"
+                  else f"Transfer failed: {result}")
+            return
 
         Transaction(sender, amount, "TRANSFER_DEBIT").save()
         Transaction(receiver, amount, "TRANSFER_CREDIT").save()
 
-        Notification.send(sender, f"Transferred {amount} to {receiver}")
-        Notification.send(receiver, f"Received {amount} from {sender}")
+        Notification.send(sender, f"Transferred {format_cents(amount)} to {receiver}")
+        Notification.send(receiver, f"Received {format_cents(amount)} from {sender}")
+        return result
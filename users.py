@@ -0,0 +1,156 @@
+import atexit
+import csv
+import os
+import time
+from collections import OrderedDict
+from csvload import iter_chunks, STR
+
+USERS_FILE = "Detail.csv"
+USER_FIELDS = ["user_name", "passcode", "status"]
+# Names may be all digits and passcodes may start with 0: both stay text.
+USER_TYPES = {"user_name": STR, "passcode": STR}
+USER_BATCH_SIZE = 100
+
+SESSION_TTL = 300
+SESSION_MAX = 10000
+
+
+class UserStore:
+    """Users of Detail.csv indexed by name.
+
+    Lookups and registrations are dict operations. New users are buffered
+    and appended in batches of batch_size (and at exit), each batch in one
+    write followed by an fsync.
+    """
+
+    def __init__(self, path=USERS_FILE, batch_size=USER_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.users = {}
+        self.pending = []
+        self.load()
+        atexit.register(self.flush)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            with open(self.path, "w", newline="") as f:
+                csv.writer(f).writerow(USER_FIELDS)
+            return
+        for chunk in iter_chunks(self.path, types=USER_TYPES):
+            if not chunk:
+                continue
+            self.users.update(zip(chunk["user_name"],
+                                  zip(chunk["passcode"], chunk["status"])))
+
+    def __len__(self):
+        return len(self.users)
+
+    def __contains__(self, name):
+        return name in self.users
+
+    def get(self, name):
+        return self.users.get(name)
+
+    def register(self, name, passcode, status):
+        if name in self.users:
+            return False
+        self.users[name] = (passcode, status)
+        self.pending.append([name, passcode, status])
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+        return True
+
+    def check(self, name, passcode):
+        user = self.users.get(name)
+        if user is None:
+            return "not_found"
+        if user[0] != passcode:
+            return "wrong_passcode"
+        return "active" if user[1] == 1 else "inactive"
+
+    def bulk_import(self, path):
+        """Validate a CSV of users and append the good ones in one write.
+
+        Returns (added, rejects) where rejects is a list of
+        (line number, user name, reason).
+        """
+        added = 0
+        rejects = []
+        with open(path, "r", newline="") as f:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader, [])]
+            if header[:3] != USER_FIELDS:
+                return 0, [(1, "", "Header must be " + ",".join(USER_FIELDS))]
+            for line_no, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                if len(row) < 3:
+                    rejects.append((line_no, row[0], "Missing fields"))
+                    continue
+                name = row[0].strip()
+                if not name or "," in name:
+                    rejects.append((line_no, name, "Invalid username"))
+                    continue
+                passcode = row[1].strip()
+                if not passcode.isdigit():
+                    rejects.append((line_no, name, "Passcode must be numbers only"))
+                    continue
+                if row[2].strip() not in ("0", "1"):
+                    rejects.append((line_no, name, "Status must be 0 or 1"))
+                    continue
+                if name in self.users:
+                    rejects.append((line_no, name, "User already exists"))
+                    continue
+                self.users[name] = (passcode, int(row[2]))
+                self.pending.append([name, passcode, int(row[2])])
+                added += 1
+        self.flush()
+        return added, rejects
+
+    def flush(self):
+        if not self.pending:
+            return
+        with open(self.path, "a+b") as f:
+            # Detail.csv is hand edited and may not end with a newline.
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) not in (b"\n", b"\r"):
+                    f.write(b"\n")
+            lines = "".join(f"{name},{passcode},{status}\n"
+                            for name, passcode, status in self.pending)
+            f.write(lines.encode())
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending = []
+
+
+class SessionCache:
+    """Recently authenticated users, so a repeat check skips the passcode.
+
+    Entries expire ttl seconds after login; past max_size the least recently
+    used session is dropped.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_size=SESSION_MAX):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sessions = OrderedDict()
+
+    def add(self, name):
+        self.sessions[name] = time.monotonic() + self.ttl
+        self.sessions.move_to_end(name)
+        if len(self.sessions) > self.max_size:
+            self.sessions.popitem(last=False)
+
+    def valid(self, name):
+        expires = self.sessions.get(name)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self.sessions[name]
+            return False
+        self.sessions.move_to_end(name)
+        return True
+
+    def end(self, name):
+        self.sessions.pop(name, None)
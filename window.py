@@ -0,0 +1,158 @@
+import struct
+import tempfile
+import threading
+from array import array
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+
+WINDOW_SIZE = 100
+WINDOW_DAYS = None
+SPILL_DIR = None  # system temp directory
+
+# Spill record: offset of the same account's previous record, payload length.
+RECORD = struct.Struct("<qI")
+SEP = "\x1f"
+
+
+class SpillFile:
+    """Append-only scratch file holding transactions evicted from memory.
+
+    Records of one account are chained newest to oldest through their
+    back-pointers, so a window only keeps the offset of its newest record.
+    The file has no name and disappears when the process exits.
+    """
+
+    def __init__(self, directory=SPILL_DIR):
+        self.f = tempfile.TemporaryFile(dir=directory)
+        self.lock = threading.Lock()
+
+    def append(self, prev, payload):
+        data = payload.encode()
+        with self.lock:
+            offset = self.f.seek(0, 2)
+            self.f.write(RECORD.pack(prev, len(data)) + data)
+        return offset
+
+    def read(self, offset):
+        """(previous offset, payload) of the record at offset"""
+        with self.lock:
+            self.f.seek(offset)
+            prev, length = RECORD.unpack(self.f.read(RECORD.size))
+            return prev, self.f.read(length).decode()
+
+    def chain(self, head):
+        """Offsets of the records from head back to the first, newest first"""
+        offsets = array("q")
+        while head != -1:
+            offsets.append(head)
+            head = self.read(head)[0]
+        return offsets
+
+
+_spill = None
+
+
+def default_spill():
+    global _spill
+    if _spill is None:
+        _spill = SpillFile()
+    return _spill
+
+
+class TransactionWindow:
+    """List of an account's transactions with only the newest kept in memory.
+
+    Holds at most max_items transactions, and with max_days none older than
+    that many days; the rest are read back when iterated or indexed. A
+    leading run appended with stored=True is already in the ledger and is
+    read back from source(), which yields it oldest first; later
+    transactions spill to a SpillFile. Transactions are only appended, so
+    positions never change. encode / decode turn a transaction into a
+    string and back.
+    """
+
+    def __init__(self, encode, decode, max_items=None, max_days=None, spill=None,
+                 source=None):
+        self.encode = encode
+        self.decode = decode
+        self.max_items = WINDOW_SIZE if max_items is None else max_items
+        self.max_days = WINDOW_DAYS if max_days is None else max_days
+        self.spill = spill or default_spill()
+        self.source = source
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.stored = 0  # leading transactions source() gives back
+        self.backed = 0  # of those, the ones no longer in memory
+        self.spilled = 0
+        self.head = -1
+
+    def append(self, transaction, stored=False):
+        with self.lock:
+            if stored and self.source is not None and self.stored == self._len():
+                self.stored += 1
+            self.recent.append(transaction)
+            self._evict()
+
+    def _evict(self):
+        cutoff = None
+        if self.max_days is not None:
+            cutoff = (datetime.now() - timedelta(days=self.max_days)).strftime("%Y-%m-%d %H:%M:%S")
+        while self.recent and (len(self.recent) > self.max_items
+                               or (cutoff and self.recent[0].timestamp < cutoff)):
+            transaction = self.recent.popleft()
+            if self.backed < self.stored:
+                self.backed += 1
+                continue
+            self.head = self.spill.append(self.head, self.encode(transaction))
+            self.spilled += 1
+
+    def resize(self, max_items=None, max_days=None):
+        with self.lock:
+            if max_items is not None:
+                self.max_items = max_items
+            self.max_days = max_days
+            self._evict()
+
+    def paged(self, head=None):
+        """Spilled transactions, oldest first, read one at a time"""
+        head = self.head if head is None else head
+        for offset in reversed(self.spill.chain(head)):
+            yield self.decode(self.spill.read(offset)[1])
+
+    def _older(self, backed, head):
+        if backed:
+            yield from islice(self.source(), backed)
+        yield from self.paged(head)
+
+    def _len(self):
+        return self.backed + self.spilled + len(self.recent)
+
+    def __len__(self):
+        with self.lock:
+            return self._len()
+
+    def __iter__(self):
+        with self.lock:
+            backed, head, recent = self.backed, self.head, list(self.recent)
+        yield from self._older(backed, head)
+        yield from recent
+
+    def __getitem__(self, index):
+        with self.lock:
+            older = self.backed + self.spilled
+            if isinstance(index, slice):
+                start, stop, step = index.indices(self._len())
+                if start >= older and step == 1:
+                    return list(islice(self.recent, start - older, stop - older))
+            else:
+                if index < 0:
+                    index += self._len()
+                if not 0 <= index < self._len():
+                    raise IndexError("transaction index out of range")
+                if index >= older:
+                    return self.recent[index - older]
+            backed, head = self.backed, self.head
+        if isinstance(index, slice):
+            return list(self)[index]
+        return next(islice(self._older(backed, head), index, None))
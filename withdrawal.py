@@ -1,11 +1,17 @@
 from accounts import AccountValidation
 from balance import BalanceManagement
-from transaction import Transaction
+from transac import Transaction
 from notification import Notification
 from fraud import FraudDetection
+from idempotency import idempotency
+from money import to_cents, format_cents
 
 class Withdrawal(Transaction):
-    def process(self):
+    def process(self, idempotency_key=None):
+        return idempotency.run(idempotency_key,
+                               ["withdrawal", self.acc_no, self.amount], self._process)
+
+    def _process(self):
         acc = AccountValidation.get_account(self.acc_no)
         if not acc:
             print("Invalid account")
@@ -15,15 +21,20 @@ class Withdrawal(Transaction):
             print("Invalid withdrawal amount")
             return
 
-        if float(acc["balance"]) < self.amount:
+        if to_cents(acc["balance"]) < self.amount:
             print("Insufficient balance")
             return
 
-        FraudDetection.check(self.amount)
+        FraudDetection.check(self.amount, self.acc_no)
 
-        new_balance = float(acc["balance"]) - self.amount
-        BalanceManagement.update_balance(self.acc_no, new_balance)
+        ok, result = BalanceManagement.adjust([(self.acc_no, -self.amount, 0)])
+        if not ok:
+            print("Insufficient balance" if result == "INSUFFICIENT"
+                  else f"Withdrawal failed: {result}")
+            return
+        new_balance = result[self.acc_no]
 
         self.save()
         Notification.send(self.acc_no,
-            f"Withdrawn {self.amount}. New Balance: {new_balance}")
+            f"Withdrawn {format_cents(self.amount)}. New Balance: {format_cents(new_balance)}")
+        return new_balance